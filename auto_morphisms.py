@@ -1,13 +1,18 @@
 """
 This program implements the optimization in the branching algorithm, with the use of a generating set.
 """
+from typing import Optional, Union
+
 from basicpermutationgroup import Orbit, Stabilizer
-from graph import Graph, Vertex
+from graph import Graph
+from compact_graph import CompactGraph
 from graph_io import load_graph
 from permv2 import permutation
 
-from color_refinement import color_refinement
-from branching import is_balanced, is_bijection, get_c, count_isomorphism
+from coloring import Coloring, union_neighbours
+from fast_color_refinement import stable_coloring
+from branching import get_coloring_c, count_isomorphism, check_limits, \
+    SearchResult, COMPLETE
 
 
 def compute_order(h: list[permutation]) -> int:
@@ -71,87 +76,117 @@ def is_member(h: list[permutation], f: permutation) -> bool:
     return composition in stabilizer or is_member(stabilizer, composition)
 
 
-def count_automorphisms(g: Graph) -> int:
+def count_automorphisms(g: Union[Graph, CompactGraph], coloring: Optional[Coloring] = None) -> int:
     """
-    Counts the number of automorphisms that are present in the graph G.
-    :param g: The graph G
+    Counts the number of automorphisms that are present in the graph G. The graph is not changed.
+    :param g: The graph G, which may also be a `CompactGraph`
+    :param coloring: Optional, a coloring of the vertices of G, only automorphisms that keep the colors are counted. By
+    default the vertices start with their `colornum`, see `coloring.Coloring.from_graphs`.
     :return: The number of automorphisms.
     """
+    return automorphism_search(g, coloring).count
+
+
+def automorphism_search(g: Union[Graph, CompactGraph], coloring: Optional[Coloring] = None,
+                        node_budget: Optional[int] = None, deadline: Optional[float] = None) -> SearchResult:
+    """
+    Counts the number of automorphisms of the graph G within a node budget and a deadline. The branching tree is
+    searched depth first with an explicit stack, like `branching.search_isomorphisms`.
+    :param g: The graph G, which may also be a `CompactGraph`
+    :param coloring: Optional, a coloring of the vertices of G, see `count_automorphisms`
+    :param node_budget: Optional, the maximal number of nodes of the branching tree to visit
+    :param deadline: Optional, the `time.monotonic()` time at which to stop
+    :return: The result with the number of automorphisms. If the search was stopped, this is the order of the group
+    generated by the automorphisms found until then, which divides the number of automorphisms.
+    """
+    n = len(g)
 
-    def generate_mapping(g: Graph, h: Graph):
+    def generate_mapping(coloring: Coloring) -> permutation:
         """
         Generates the corresponding mapping from vertex to vertex for the isomorphism between graphs g and h.
         We map g to h.
-        :param g: A graph
-        :param h: A graph
+        :param coloring: The coloring of the disjoint union of g and h, in which every color has one vertex of both
         :return: A permutation with the mapping from g to h
         """
-        mapping = [0] * len(g.vertices)
-        for v_g in g:
-            for v_h in h:
-                if v_g.colornum == v_h.colornum:
-                    mapping[v_g.label] = v_h.label
+        color_to_id = [0] * n
+        for v_h in range(n, 2 * n):
+            color_to_id[coloring.colors[v_h]] = v_h - n
+        mapping = [color_to_id[coloring.colors[v_g]] for v_g in range(n)]
         return permutation(len(mapping), mapping=mapping)
 
-    def generate_automorphisms(g: Graph, h: Graph, d: list[Vertex], i: list[Vertex]):
-        """
-        Is called recursively to traverse through the branching tree and to find all automorphisms.
-        :param g: A copy of the original graph
-        :param h: Another copy of the original graph
-        :param d: A list with pre-colored vertices for graph g
-        :param i: A list with pre-colored vertices for graph h
-        """
-
-        # Refine the graphs g and h.
-        color_refinement([g, h])
+    # Both g and h are G, the vertices of h are numbered n..2n-1 in the coloring of their disjoint union. Every branch
+    # refines the coloring in place, and undoes that when it is left.
+    generating_set = []
+    neighbours = union_neighbours([g, g])
+    if coloring is None:
+        coloring = Coloring.from_graphs([g, g])
+    else:
+        coloring = Coloring(coloring.colors + coloring.colors)
+    coloring.track_balance(n)
+    stable_coloring(coloring, neighbours)
+
+    # The pre-colored vertices of g, and those of h with the `used` marks of the node that colored them. The vertices
+    # of h that are marked as 'used' in a node are skipped as candidates; every node starts with a copy of the marks
+    # of its parent, like a copy of the graph with `Vertex.pre_labeled` would.
+    d = []
+    i = []
+    used = bytearray(n)
+
+    # For every node on the path to the current node: its color class c, x, the next candidate, its `used` marks and
+    # its number of colors
+    stack = []
+    nodes = 0
+    while True:
+        status = check_limits(nodes, node_budget, deadline)
+        if status != COMPLETE:
+            break
+        nodes += 1
 
         # Make sure that the colors are balanced, and check for a bijection.
-        if not is_balanced(g, h):
-            return
-        if is_bijection(g, h):
+        if coloring.unbalanced > 0:
+            pass
+        elif len(coloring) == n:
 
             # Generate the mapping from g -> h.
-            p = generate_mapping(g, h)
+            p = generate_mapping(coloring)
 
             # If the permutation cannot be generated by this generating set, we need to add it.
             if not is_member(generating_set, p):
                 generating_set.append(p)
 
             # We can now back to the last trivial ancestor nodes in the branching tree.
-            while [v.label for v in d] != [v.label for v in i]:
+            while d != [v_h for marks, v_h in i]:
                 # We remove the vertices from d and i and mark them as 'used'.
                 # This should prevent the algorithm from trying to re-explore a branch that may be skipped.
                 # FIXME: This strategy seems too aggressive, the results are sometimes off by a factor 2 or 4
-                d.pop().pre_labeled = True
-                i.pop().pre_labeled = True
-
-            return
-
-        c, next_color = get_c([g, h])
-        for v_g in g:
-            if v_g.colornum == c:# and not v_g.pre_labeled:
-                x = v_g
-                break
-
-        for v_h in h:
-            if v_h.colornum == c and not v_h.pre_labeled:
-                g1 = g + Graph(False)
-                h1 = h + Graph(False)
-                g1.vertices[g.vertices.index(x)].colornum = next_color
-                h1.vertices[h.vertices.index(v_h)].colornum = next_color
+                d.pop()
+                marks, v_h = i.pop()
+                marks[v_h] = True
+        else:
+            c = get_coloring_c(coloring)
+            x = min(v for v in coloring.members(c) if v < n)
+            stack.append([c, x, 0, used, len(coloring)])
+
+        # Go to the next branch: undo the current one, and individualize x and the next candidate v_h
+        while len(stack) > 0:
+            c, x, v_h, used, number_of_colors = stack[-1]
+            coloring.undo(number_of_colors)
+            while v_h < n and (coloring.colors[n + v_h] != c or used[v_h]):
+                v_h += 1
+            if v_h < n:
+                stack[-1][2] = v_h + 1
+                coloring.individualize(neighbours, [x, n + v_h])
                 d.append(x)
-                i.append(v_h)
-                generate_automorphisms(g1, h1, d, i)
+                i.append((used, v_h))
+                used = used[:]
+                break
+            stack.pop()
+        else:
+            break
 
-    generating_set = []
-    graph_copy_1 = g + Graph(False)
-    graph_copy_2 = g + Graph(False)
-    for v in graph_copy_1.vertices:
-        v.pre_labeled = False
-    for v in graph_copy_2.vertices:
-        v.pre_labeled = False
-    generate_automorphisms(graph_copy_1, graph_copy_2, [], [])
-    return compute_order(generating_set)
+    # Without any automorphism (only if the search was stopped right away) the group is trivial
+    order = compute_order(generating_set) if len(generating_set) > 0 else 1
+    return SearchResult(order, None, status, nodes)
 
 
 if __name__ == '__main__':
@@ -169,8 +204,8 @@ if __name__ == '__main__':
 
     for i in range(len(graphs[0])):
         g = graphs[0][i]
-        c_auto = count_automorphisms(g + Graph(False))
+        c_auto = count_automorphisms(g)
         print(f"Graph {i} count_automorphisms: {c_auto}; ", end="")
 
-        c_iso = count_isomorphism(g + Graph(False), g + Graph(False), [], [])
+        c_iso = count_isomorphism(g, g)
         print(f"count_isomorphisms: {c_iso}")
\ No newline at end of file
@@ -2,150 +2,354 @@
 This program implements the branching algorithm for individual color refinement.
 """
 
-from graph import Graph, Vertex
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from time import monotonic
+from typing import Optional, Union
+
+from graph import Graph
 from graph_io import load_graph
-from color_refinement import color_refinement
+from compact_graph import CompactGraph
+from coloring import Coloring, union_neighbours
+from fast_color_refinement import stable_coloring
+
+
+# The status of a search: whether it searched the whole branching tree, or it was stopped at a limit
+COMPLETE = 'complete'
+NODE_BUDGET_EXCEEDED = 'node budget exceeded'
+DEADLINE_PASSED = 'deadline passed'
+
+# The number of nodes that a task of a parallel search may visit before the rest of its subtree is split into new tasks
+SPLIT_NODES = 500
 
 
-def get_c(graphs: list[Graph]) -> tuple[int, int]:
+class SearchResult(object):
     """
-    FIXME: Complexity -> O(n) n = |V(g)| + |V(h)|
+    The result of a search in a branching tree, which may have been stopped before the whole tree was searched.
+    """
+
+    __slots__ = ('count', 'coloring', 'status', 'nodes')
+
+    def __init__(self, count: int, coloring: Optional[Coloring], status: str, nodes: int):
+        """
+        :param count: The number that was counted, for a stopped search the number that was counted until then
+        :param coloring: The coloring of the isomorphism that was found, if the search looked for one
+        :param status: `COMPLETE`, `NODE_BUDGET_EXCEEDED` or `DEADLINE_PASSED`
+        :param nodes: The number of nodes of the branching tree that were visited
+        """
+        self.count = count
+        self.coloring = coloring
+        self.status = status
+        self.nodes = nodes
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the result.
+        :return: The string to approximate the constructor arguments of the `SearchResult'
+        """
+        return 'SearchResult(count={}, status={!r}, nodes={})'.format(self.count, self.status, self.nodes)
+
+    @property
+    def complete(self) -> bool:
+        """
+        :return: Whether the whole branching tree was searched, so that the result is exact
+        """
+        return self.status == COMPLETE
+
 
-    Calculates c and while we're at it the next new color.
-    :param graphs: The refined graphs
-    :return: c and the next new color
+def check_limits(nodes: int, node_budget: Optional[int], deadline: Optional[float]) -> str:
     """
-    colors = {}
-    for graph in graphs:
-        for v in graph.vertices:
-            if v.colornum not in colors.keys():
-                colors[v.colornum] = 1
-            else:
-                colors[v.colornum] += 1
-                if colors[v.colornum] >= 4:
-                    return v.colornum, len(colors.keys())
+    Checks whether a search may visit another node.
+    :param nodes: The number of nodes that were visited
+    :param node_budget: Optional, the maximal number of nodes to visit
+    :param deadline: Optional, the `time.monotonic()` time at which to stop
+    :return: `COMPLETE` if the search may go on, otherwise the status of the limit that was hit
+    """
+    if node_budget is not None and nodes >= node_budget:
+        return NODE_BUDGET_EXCEEDED
+    if deadline is not None and monotonic() >= deadline:
+        return DEADLINE_PASSED
+    return COMPLETE
 
 
-def count_isomorphism(g: Graph, h: Graph, d: list[Vertex] = [], i: list[Vertex] = []) -> int:
+def count_isomorphism(g: Union[Graph, CompactGraph], h: Union[Graph, CompactGraph], coloring: Optional[Coloring] = None,
+                      processes: Optional[int] = None) -> int:
     """
-    Counts the number of isomorphisms between the graphs g and h.
-    :param g: The graph g
-    :param h: The graph h
-    :param d: A subset of the vertices from graph g
-    :param i: A subset of the vertices from graph h
+    Counts the number of isomorphisms between the graphs g and h. The graphs are not changed, so g and h may even be
+    the same graph.
+    :param g: The graph g, which may also be a `CompactGraph`
+    :param h: The graph h, which may also be a `CompactGraph`
+    :param coloring: Optional, the start coloring of the disjoint union of g and h, only isomorphisms that keep the
+    colors are counted. By default the vertices start with their `colornum`, see `coloring.Coloring.from_graphs`.
+    :param processes: Optional, search the branches in a pool of this many processes (0 for one per CPU), see
+    `parallel_search_isomorphisms`
     :return: The number of isomorphisms between the graphs g and h.
     """
-    # Refine the graphs
-    refined = color_refinement([g, h])
+    return isomorphism_search(g, h, coloring, processes=processes).count
 
-    if not is_balanced(g, h):
-        return 0
-    if is_bijection(g, h):
-        return 1
 
-    # Determine the color class c, which should have at least 4 vertices.
-    c, next_color = get_c([g, h])
+def count_ismorphism_2(g, h, coloring=None, processes=None):
+    """
+        Decides whether the graphs g and h are isomorphic.
+        :param g: The graph g, which may also be a `CompactGraph`
+        :param h: The graph h, which may also be a `CompactGraph`
+        :param coloring: Optional, the start coloring of the disjoint union of g and h, see `count_isomorphism`
+        :param processes: Optional, search in a pool of this many processes, see `count_isomorphism`
+        :return: True if there is an isomorphism between the graphs g and h.
+        """
+    return find_isomorphism(g, h, coloring, processes) is not None
+
+
+def find_isomorphism(g: Union[Graph, CompactGraph], h: Union[Graph, CompactGraph],
+                     coloring: Optional[Coloring] = None, processes: Optional[int] = None) -> Optional[Coloring]:
+    """
+    Finds an isomorphism between the graphs g and h.
+    :param g: The graph g, which may also be a `CompactGraph`
+    :param h: The graph h, which may also be a `CompactGraph`
+    :param coloring: Optional, the start coloring of the disjoint union of g and h, see `count_isomorphism`
+    :param processes: Optional, search in a pool of this many processes, see `count_isomorphism`
+    :return: A coloring of the disjoint union of g and h in which every color has one vertex of g and the vertex of h
+    that it is mapped to, or None if the graphs are not isomorphic
+    """
+    return isomorphism_search(g, h, coloring, True, processes=processes).coloring
+
+
+def isomorphism_search(g: Union[Graph, CompactGraph], h: Union[Graph, CompactGraph],
+                       coloring: Optional[Coloring] = None, find_one: bool = False, node_budget: Optional[int] = None,
+                       deadline: Optional[float] = None, processes: Optional[int] = None) -> SearchResult:
+    """
+    Counts the isomorphisms between the graphs g and h, or finds one, within a node budget and a deadline.
+    By default the branching tree is searched in this process. With `processes` its branches are searched in a pool of
+    processes instead, see `parallel_search_isomorphisms`.
+    :param g: The graph g, which may also be a `CompactGraph`
+    :param h: The graph h, which may also be a `CompactGraph`
+    :param coloring: Optional, the start coloring of the disjoint union of g and h, see `count_isomorphism`
+    :param find_one: Whether to stop at the first isomorphism
+    :param node_budget: Optional, the maximal number of nodes of the branching tree to visit
+    :param deadline: Optional, the `time.monotonic()` time at which to stop, for instance `monotonic() + 10`
+    :param processes: Optional, the number of processes to search with (0 for one per CPU)
+    :return: The result, with the number of isomorphisms found (at most 1 if `find_one` is set) and the coloring of the
+    one found if `find_one` is set, see `search_isomorphisms`
+    """
+    # Refine the graphs once, the branches only refine from the vertices that they individualize. The refinement stops
+    # as soon as the colors are not balanced.
+    neighbours = union_neighbours([g, h])
+    coloring = Coloring.from_graphs([g, h]) if coloring is None else coloring.copy()
+    coloring.track_balance(len(g))
+    stable_coloring(coloring, neighbours)
+    if processes is None or coloring.unbalanced > 0 or len(coloring) == len(g):
+        return search_isomorphisms(coloring, neighbours, len(g), find_one, node_budget, deadline)
+    return parallel_search_isomorphisms(coloring, neighbours, len(g), find_one, node_budget, deadline, processes)
 
-    # Select a vertex from the first graph, variable x.
-    # (See the pseudo-code in the second lecture of the project (Slide 12))
-    # FIXME: O(n), n = |V(g)|
-    for vertex in g:
-        if vertex.colornum == c and vertex not in d:
-            x = vertex
-            break
 
+def search_isomorphisms(coloring: Coloring, neighbours: list[list[int]], n: int, find_one: bool = False,
+                        node_budget: Optional[int] = None, deadline: Optional[float] = None,
+                        frontier: Optional[list[list[tuple[int, int]]]] = None) -> SearchResult:
+    """
+    Searches the isomorphisms between two graphs, given the stable coloring of their disjoint union. The vertices of
+    the first graph are 0..n-1 and those of the second graph n..2n-1, see `coloring.union_neighbours`, and the coloring
+    should keep track of its balance (see `Coloring.track_balance`): a branch is pruned as soon as its refinement
+    makes the colors unbalanced.
+    The branching tree is searched depth first with an explicit stack instead of recursion. Every branch refines the
+    same coloring in place and undoes its splits when it is left (see `Coloring.undo`), so nothing is copied per
+    branch and the memory use only grows with the depth of the search.
+    :param coloring: The stable (or unbalanced) coloring, which is the same again when this returns
+    :param neighbours: The neighbours of every vertex of the union
+    :param n: The number of vertices of the first graph
+    :param find_one: Whether to stop at the first isomorphism
+    :param node_budget: Optional, the maximal number of nodes to visit
+    :param deadline: Optional, the `time.monotonic()` time at which to stop
+    :param frontier: Optional, if the search is stopped at a limit the nodes that it did not search are added to this
+    list, as the pairs (x, y) that are individualized on the path to them. Searching these nodes as well gives the rest
+    of the result.
+    :return: The number of isomorphisms (at most 1 if `find_one` is set), and a copy of the coloring of the first one if
+    `find_one` is set. If the search was stopped, the number found until then.
+    """
     num = 0
-    # FIXME: O(n), n = |V(h)|
-    for vertex in h:
-        if vertex.colornum == c and vertex not in i:
-            # We have to create deep copies of all the graphs and lists,
-            # otherwise they will be affected by the recursive calls.
-            g1 = Graph(False) + g  # Adding an empty graph to the current graph is quicker than the deepcopy library ;)
-            h1 = Graph(False) + h  # FIXME: O(n + m), n = |V(h)|, m = |E(h)|
-            g1.vertices[g.vertices.index(x)].colornum = next_color
-            h1.vertices[h.vertices.index(vertex)].colornum = next_color
-            d1 = d[::]  # FIXME: O(n), n = |d|
-            i1 = i[::]
-            d1.append(x)
-            i1.append(vertex)
-            num = num + count_isomorphism(g1, h1, d1, i1)
-
-    return num
-
-
-def count_ismorphism_2(g, h, d, i):
-    """
-        Counts the number of isomorphisms between the graphs g and h.
-        :param g: The graph g
-        :param h: The graph h
-        :param d: A subset of the vertices from graph g
-        :param i: A subset of the vertices from graph h
-        :return: The number of isomorphisms between the graphs g and h.
-        """
-    # Refine the graphs
-    refined = color_refinement([g, h])
-
-    if not is_balanced(g, h):
-        return False
-    if is_bijection(g, h):
-        return True
-
-    # Determine the color class c, which should have at least 4 vertices.
-    c, next_color = get_c([g, h])
-
-    # Select a vertex from the first graph, variable x.
-    # (See the pseudo-code in the second lecture of the project (Slide 12))
-    # FIXME: O(n), n = |V(g)|
-    for vertex in g:
-        if vertex.colornum == c and vertex not in d:
-            x = vertex
+    nodes = 0
+    status = COMPLETE
+    found = None
+    number_of_colors = len(coloring)
+
+    # For every node on the path to the current node: x, the candidates for y, the next candidate and the number of
+    # colors of its coloring (to undo the refinement of a branch)
+    stack = list()
+    while True:
+        status = check_limits(nodes, node_budget, deadline)
+        if status != COMPLETE:
             break
+        nodes += 1
+
+        if coloring.unbalanced > 0:
+            pass
+        elif len(coloring) == n:
+            # Every color has one vertex from both graphs
+            num = num + 1
+            if find_one:
+                found = coloring.copy()
+                break
+        else:
+            # Determine the color class c, which should have at least 4 vertices.
+            c = get_coloring_c(coloring)
+
+            # Select a vertex from the first graph, variable x.
+            # (See the pseudo-code in the second lecture of the project (Slide 12))
+            x = min(v for v in coloring.members(c) if v < n)
+            stack.append([x, sorted(v for v in coloring.members(c) if v >= n), 0, len(coloring)])
+
+        # Go to the next branch: undo the current one, and individualize x and the next candidate y
+        while len(stack) > 0:
+            x, candidates, index, colors = stack[-1]
+            coloring.undo(colors)
+            if index < len(candidates):
+                stack[-1][2] = index + 1
+                coloring.individualize(neighbours, [x, candidates[index]])
+                break
+            stack.pop()
+        else:
+            break
+
+    # The search stopped right before visiting the node of the current path, so that node and the candidates that are
+    # left on the path were not searched
+    if frontier is not None and status != COMPLETE:
+        path = list()
+        for x, candidates, index, colors in stack:
+            frontier.extend(path + [(x, y)] for y in candidates[index:])
+            path.append((x, candidates[index - 1]))
+        frontier.append(path)
+
+    coloring.undo(number_of_colors)
+    return SearchResult(num, found, status, nodes)
 
-    num = 0
-    # FIXME: O(n), n = |V(h)|
-    for vertex in h:
-        if vertex.colornum == c and vertex not in i:
-            # We have to create deep copies of all the graphs and lists,
-            # otherwise they will be affected by the recursive calls.
-            g1 = Graph(False) + g  # Adding an empty graph to the current graph is quicker than the deepcopy library ;)
-            h1 = Graph(False) + h  # FIXME: O(n + m), n = |V(h)|, m = |E(h)|
-            g1.vertices[g.vertices.index(x)].colornum = next_color
-            h1.vertices[h.vertices.index(vertex)].colornum = next_color
-            d1 = d[::]  # FIXME: O(n), n = |d|
-            i1 = i[::]
-            d1.append(x)
-            i1.append(vertex)
-            if count_ismorphism_2(g1, h1, d1, i1):
-                return True
-            # num = num + count_isomorphism(g1, h1, d1, i1)
 
-    # return num
+# The coloring and the search of a worker process of `parallel_search_isomorphisms`, see `start_worker`
+worker_search = None
 
 
-def is_balanced(g: Graph, h: Graph):
+def start_worker(coloring: Coloring, neighbours: list[list[int]], n: int, find_one: bool,
+                 deadline: Optional[float]):
     """
-    FIXME: Complexity -> 2*2n -> O(n) n = |V(g)| = |V(h)|
-    Instead of a sorted list we now generate a set, which is faster. But it does not keep track of the number of
-    vertices within a color group. This might cause issues in next iterations. But for now all tests pass!
+    Initializes a worker process of `parallel_search_isomorphisms`: every task of the process starts from this
+    coloring, so it is sent to the process only once.
+    :param coloring: The stable coloring of the disjoint union of the two graphs
+    :param neighbours: The neighbours of every vertex of the union
+    :param n: The number of vertices of the first graph
+    :param find_one: Whether to stop at the first isomorphism
+    :param deadline: Optional, the `time.monotonic()` time at which to stop
+    """
+    global worker_search
+    worker_search = (coloring, neighbours, n, find_one, deadline)
+
 
-    Check if the graphs are balanced.
-    :param g: The first graph
-    :param h: The second graph
-    :return: True if both graphs have the same colors
+def search_subtree(path: list[tuple[int, int]], node_budget: int) -> tuple[SearchResult, list[list[tuple[int, int]]]]:
+    """
+    A task of `parallel_search_isomorphisms`: searches the subtree of a node of the branching tree in a worker process.
+    :param path: The pairs (x, y) that are individualized on the path to the node
+    :param node_budget: The maximal number of nodes to visit
+    :return: The result of the search of the subtree, and the nodes of the subtree that were not searched if the node
+    budget was not enough
     """
-    return set(v.colornum for v in g.vertices) == set(v.colornum for v in h.vertices)
+    coloring, neighbours, n, find_one, deadline = worker_search
+    number_of_colors = len(coloring)
+    for x, y in path:
+        coloring.individualize(neighbours, [x, y])
 
+    frontier = list()
+    result = search_isomorphisms(coloring, neighbours, n, find_one, node_budget, deadline, frontier)
+    coloring.undo(number_of_colors)
+    return result, [path + branch for branch in frontier]
 
-def is_bijection(g: Graph, h: Graph):
+
+def task_nodes(split_nodes: int, node_budget: Optional[int], nodes: int) -> int:
+    """
+    :param split_nodes: The maximal number of nodes that a task visits
+    :param node_budget: Optional, the maximal number of nodes of the whole search
+    :param nodes: The number of nodes that the finished tasks visited
+    :return: The number of nodes that a new task may visit
     """
-    FIXME: Complexity -> O(n)
+    if node_budget is None:
+        return split_nodes
+    return max(1, min(split_nodes, node_budget - nodes))
+
+
+def parallel_search_isomorphisms(coloring: Coloring, neighbours: list[list[int]], n: int, find_one: bool = False,
+                                 node_budget: Optional[int] = None, deadline: Optional[float] = None,
+                                 processes: int = 0, split_nodes: int = SPLIT_NODES) -> SearchResult:
+    """
+    Searches the isomorphisms like `search_isomorphisms`, in a pool of processes. The subtrees of the branching tree do
+    not depend on each other, so they are searched by separate tasks and the counts are added up. The branches of the
+    top-level candidates are the first tasks. A task visits at most `split_nodes` nodes, and then the nodes of its
+    subtree that it did not search become new tasks. So the tree is split where it is large, and all processes keep
+    working even if some branches are much larger than others. When `find_one` is set, the search stops at the first
+    isomorphism that a task finds.
+    Starting the processes takes some tens of milliseconds, so this only pays off for searches that take a while.
+    :param coloring: The stable coloring, see `search_isomorphisms`
+    :param neighbours: The neighbours of every vertex of the union
+    :param n: The number of vertices of the first graph
+    :param find_one: Whether to stop at the first isomorphism
+    :param node_budget: Optional, the number of nodes after which no new tasks are started. The tasks that are running
+    still finish, so the search may visit more nodes, at most `split_nodes` more for every running task.
+    :param deadline: Optional, the `time.monotonic()` time at which to stop
+    :param processes: The number of processes, 0 for one per CPU
+    :param split_nodes: The maximal number of nodes that a task visits
+    :return: The result, see `search_isomorphisms`
+    """
+    num = 0
+    nodes = 0
+    status = COMPLETE
+    found = None
 
-    Check if the graphs are a bijection.
-    :param g: The first graph
-    :param h: The second graph
-    :return: True if each graph has an unique color for each vertex.
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes, initializer=start_worker,
+                             initargs=(coloring, neighbours, n, find_one, deadline)) as pool:
+        # The first task only visits the root, so the branches of the top-level candidates are the first tasks
+        tasks = {pool.submit(search_subtree, list(), 1)}
+        while len(tasks) > 0:
+            done, tasks = wait(tasks, return_when=FIRST_COMPLETED)
+            frontier = list()
+            for task in done:
+                result, paths = task.result()
+                num += result.count
+                nodes += result.nodes
+                if found is None:
+                    found = result.coloring
+                if result.status == DEADLINE_PASSED:
+                    status = DEADLINE_PASSED
+                frontier.extend(paths)
+
+            if status == COMPLETE and len(tasks) + len(frontier) > 0:
+                status = check_limits(nodes, node_budget, None)
+            if status != COMPLETE or (find_one and found is not None):
+                # Count what the running tasks find until they stop
+                pool.shutdown(cancel_futures=True)
+                for task in tasks:
+                    if not task.cancelled():
+                        result, paths = task.result()
+                        num += result.count
+                        nodes += result.nodes
+                break
+
+            for path in frontier:
+                tasks.add(pool.submit(search_subtree, path, task_nodes(split_nodes, node_budget, nodes)))
+
+    if find_one:
+        num = min(num, 1)
+        if found is not None:
+            status = COMPLETE
+    return SearchResult(num, found, status, nodes)
+
+
+def get_coloring_c(coloring: Coloring) -> int:
+    """
+    Finds a color class with at least 4 vertices, the color of which the fourth vertex comes first.
+    :param coloring: The coloring of the disjoint union of the two graphs
+    :return: The color c
     """
-    return len(set(v.colornum for v in g.vertices)) == len(g.vertices) and len(set(v.colornum for v in h.vertices)) == len(h.vertices)
+    colors = [0] * len(coloring)
+    for color in coloring.colors:
+        colors[color] += 1
+        if colors[color] >= 4:
+            return color
 
 
 if __name__ == '__main__':
@@ -164,6 +368,6 @@ if __name__ == '__main__':
     for i in range(len(graphs[0])):
         for j in range(len(graphs[0])):
             if i < j:
-                number = count_isomorphism(graphs[0][i] + Graph(False), graphs[0][j] + Graph(False))
+                number = count_isomorphism(graphs[0][i], graphs[0][j])
                 if number > 0:
                     print(f"Found {number} isomorphisms between graphs {i} and {j}\n")
@@ -1,8 +1,12 @@
 import os
 import unittest
-from time import time
+from time import time, monotonic
 
-from branching import count_isomorphism
+from branching import count_isomorphism, isomorphism_search, parallel_search_isomorphisms, COMPLETE, \
+    NODE_BUDGET_EXCEEDED, DEADLINE_PASSED
+from coloring import Coloring, union_neighbours
+from fast_color_refinement import stable_coloring
+from auto_morphisms import automorphism_search
 from graph import Graph
 from graph_io import load_graph
 
@@ -178,5 +182,56 @@ class BranchingTest(unittest.TestCase):
                 end_time = time()
                 print(f"The entire graph instance {instance} took {end_time - start_time} seconds.")
 
+    def test_search_limits(self):
+        with open('graphs/branching/torus24.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        result = isomorphism_search(graphs[0], graphs[3])
+        self.assertEqual((96, COMPLETE), (result.count, result.status))
+        self.assertTrue(result.complete)
+
+        # A stopped search gives what it found until then
+        partial = isomorphism_search(graphs[0], graphs[3], node_budget=10)
+        self.assertEqual((NODE_BUDGET_EXCEEDED, 10), (partial.status, partial.nodes))
+        self.assertLess(partial.count, 96)
+        self.assertFalse(partial.complete)
+        self.assertEqual(DEADLINE_PASSED, isomorphism_search(graphs[0], graphs[3], deadline=monotonic()).status)
+
+        partial = automorphism_search(graphs[0], node_budget=20)
+        self.assertEqual(NODE_BUDGET_EXCEEDED, partial.status)
+        self.assertEqual(0, 96 % partial.count)
+        self.assertEqual(96, automorphism_search(graphs[0]).count)
+
+        # The search is not limited by the recursion depth
+        result = isomorphism_search(Graph(False, n=1500), Graph(False, n=1500), find_one=True)
+        self.assertEqual((1, 1500), (result.count, result.nodes))
+
+    def test_parallel_search(self):
+        with open('graphs/branching/torus24.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        serial = isomorphism_search(graphs[0], graphs[3])
+        result = isomorphism_search(graphs[0], graphs[3], processes=2)
+        self.assertEqual((96, COMPLETE, serial.nodes), (result.count, result.status, result.nodes))
+        self.assertEqual(0, count_isomorphism(graphs[0], graphs[1], processes=2))
+
+        result = isomorphism_search(graphs[0], graphs[3], find_one=True, processes=2)
+        self.assertEqual((1, COMPLETE), (result.count, result.status))
+        self.assertEqual(len(graphs[0]), len(result.coloring))
+
+        # Tasks that are split after every few nodes search the same tree
+        neighbours = union_neighbours([graphs[0], graphs[3]])
+        coloring = Coloring.from_graphs([graphs[0], graphs[3]])
+        coloring.track_balance(len(graphs[0]))
+        stable_coloring(coloring, neighbours)
+        result = parallel_search_isomorphisms(coloring, neighbours, len(graphs[0]), processes=2, split_nodes=3)
+        self.assertEqual((96, serial.nodes), (result.count, result.nodes))
+
+        # The tasks that are running when the node budget is used up still finish
+        partial = isomorphism_search(graphs[0], graphs[3], node_budget=10, processes=2)
+        self.assertEqual(NODE_BUDGET_EXCEEDED, partial.status)
+        self.assertLess(partial.nodes, serial.nodes)
+        self.assertLess(partial.count, 96)
+
 if __name__ == '__main__':
     unittest.main()
@@ -11,35 +11,70 @@ An usual sequence is:
 5. Check for distinctiveness and isomorphism
 """
 
+from typing import Optional, Union
+
 from graph import *
 from graph_io import *
+from coloring import Coloring, union_neighbours, stores_colors
+from compact_graph import CompactGraph
+from numpy_color_refinement import numpy_color_refinement, numpy_refine_graphs
+
+# The implementations of color refinement that can be chosen: the pure Python one, or the one on NumPy arrays
+BACKENDS = ('python', 'numpy')
+
+
+def check_backend(backend: str):
+    """
+    Raise a ValueError if the backend is unknown.
+    :param backend: The name of the backend, see `BACKENDS`
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown color refinement backend {!r}, expected one of {}'.format(backend, BACKENDS))
 
 
-def color_refinement(graphs: list[Graph]) -> list[Graph]:
+def color_refinement(graphs: Union[list[Graph], DisjointUnion], backend: str = 'python',
+                     coloring: Optional[Coloring] = None) -> Coloring:
     """
     Does color refinement on the graphs provided.
-    :param graphs: An array with graphs.
-    :return: an array of graphs that has had its colors refined.
+    Without a start coloring, the vertices start with their color (see `merge_graphs`) and the refined colors are
+    stored in the vertices. Compact graphs cannot store colors, so if there are any, the vertices start with the
+    coloring of `Coloring.from_graphs` instead and the graphs are not changed. With a start coloring the graphs are not
+    changed either.
+    :param graphs: An array with graphs (which may be `CompactGraph`s), or a disjoint union view of them.
+    :param backend: 'python', or 'numpy' to refine on flat arrays with NumPy (see `numpy_color_refinement`). Both give
+    the same partition, but the colors may be numbered differently.
+    :param coloring: Optional, the start coloring of the vertices of their union, see `coloring.Coloring`. It is not
+    changed.
+    :return: The refined coloring of the vertices of the union
     """
-    refine_colors(merge_graphs(graphs))
-    return graphs
+    check_backend(backend)
+    if backend == 'numpy':
+        return Coloring(numpy_refine_graphs(graphs, None if coloring is None else coloring.colors))
+
+    if coloring is None and stores_colors(graphs):
+        vertices = merge_graphs(graphs)
+        refine_colors(vertices)
+        return Coloring([v.colornum for v in vertices])
+
+    colors = (Coloring.from_graphs(graphs) if coloring is None else coloring).colors[:]
+    refine_color_list(union_neighbours(graphs), colors)
+    return Coloring(colors)
 
 
-def merge_graphs(graphs: list[Graph]) -> list[Vertex]:
+def merge_graphs(graphs: Union[list[Graph], DisjointUnion]) -> list[Vertex]:
     """
     Creates a disjoint union from all the graphs in the array and already assigns the starting color.
-    :param graphs: An array with graphs.
+    The graphs are not copied, the union consists of their own vertices.
+    :param graphs: An array with graphs, or a disjoint union view of them.
     :return: One single list, which is the disjoint union of all the vertices with basic coloring.
     """
-    vertices = list()
-    # Merge all vertices into one list
-    for graph in graphs:
-        for vertex in graph.vertices:
-            vertices.append(vertex)
-            try:
-                vertex.colornum
-            except AttributeError:
-                vertex.colornum = vertex.degree
+    if not isinstance(graphs, DisjointUnion):
+        graphs = DisjointUnion(graphs)
+
+    vertices = list(graphs)
+    for vertex in vertices:
+        if vertex.colornum is None:
+            vertex.colornum = vertex.degree
 
     return vertices
 
@@ -50,45 +85,22 @@ def refine_colors(vertices: list[Vertex]):
     :param vertices: The vertices to refine.
     """
 
-    change = True
+    number_of_colors = len(set(v.colornum for v in vertices))
+
     # Check if the previous iteration yielded the same result (then the colors are stable)
-    while change is True:
-        change = False
-
-        # Split the vertices based on color
-        split_vertices = dict()
-        for v in vertices:
-            if v.colornum not in split_vertices.keys():
-                split_vertices[v.colornum] = set()
-            split_vertices.get(v.colornum).add(v)
-
-        # Check for each color if the vertices have the same neighbours and assign new colors based on that
-        color_changes = dict()
-        for vertices_with_same_color in split_vertices.values():
-
-            # Check to see which vertices with the same color have the same neighbours
-            new_colors = dict()
-            for vertex in vertices_with_same_color:
-                added = False
-                for vertices_list in new_colors.values():
-                    if have_same_neighbours(vertex, vertices_list[0]):
-                        vertices_list.append(vertex)
-                        added = True
-                        break
-                if not added:
-                    new_colors[len(new_colors.keys())] = [vertex]
-                # A change has been made if the color gets splitted into multiple new colors
-                if len(new_colors.keys()) > 1:
-                    change = True
-
-            # Add the new colors to the color_changes
-            for vertices_list in new_colors.values():
-                color_changes[len(color_changes.keys())] = vertices_list
-
-        # Set the coloring according to the values stored in the dictionary
-        for color, vertices_list in color_changes.items():
-            for vertex in vertices_list:
-                vertex.colornum = color
+    while True:
+        # Give every vertex a signature: its color and the sorted colors of its neighbours. Two vertices keep the same
+        # color iff their signatures are equal (see `have_same_neighbours`), so all colors split in one pass.
+        signatures = [(v.colornum, tuple(sorted([u.colornum for u in v.neighbours]))) for v in vertices]
+        new_colors = {signature: color for color, signature in enumerate(dict.fromkeys(signatures))}
+
+        for v, signature in zip(vertices, signatures):
+            v.colornum = new_colors[signature]
+
+        # A change has been made if a color got splitted into multiple new colors
+        if len(new_colors) == number_of_colors:
+            break
+        number_of_colors = len(new_colors)
 
 
 def have_same_neighbours(v1: Vertex, v2: Vertex) -> bool:
@@ -107,6 +119,64 @@ def have_same_neighbours(v1: Vertex, v2: Vertex) -> bool:
     return False
 
 
+def compact_color_refinement(graphs: Union[list[CompactGraph], DisjointUnion], backend: str = 'python') \
+        -> list[list[int]]:
+    """
+    Does color refinement on compact graphs, working on the vertex indices instead of `Vertex` objects.
+    Just like `merge_graphs`, every vertex starts with its degree as color.
+    :param graphs: An array with compact graphs, or a disjoint union view of them.
+    :param backend: 'python' or 'numpy', see `color_refinement`
+    :return: For every graph the list of colors of its vertices, indexed by vertex.
+    """
+    check_backend(backend)
+    if backend == 'numpy':
+        return numpy_color_refinement(graphs)
+
+    union = graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs)
+
+    colors = list()
+    for graph in union.graphs:
+        colors.extend(graph.degree(v) for v in graph)
+
+    refine_compact_colors(union, colors)
+
+    # Split the union in separate graphs again
+    return union.split(colors)
+
+
+def refine_compact_colors(union: DisjointUnion, colors: list[int]):
+    """
+    Refine the colours of the vertices of a disjoint union of compact graphs.
+    :param union: The union, the vertices are numbered by their position in the union.
+    :param colors: The colors of the vertices, which are refined in place.
+    """
+    refine_color_list(union_neighbours(union), colors)
+
+
+def refine_color_list(neighbours: list[list[int]], colors: list[int]):
+    """
+    Refine the colours of vertices that are numbered 0..n-1.
+    :param neighbours: The neighbours of every vertex
+    :param colors: The colors of the vertices, which are refined in place.
+    """
+    number_of_colors = len(set(colors))
+
+    # Check if the previous iteration yielded the same result (then the colors are stable)
+    while True:
+        # Give every vertex a signature: its color and the sorted colors of its neighbours, see `refine_colors`
+        signatures = [(color, tuple(sorted([colors[u] for u in vertex_neighbours])))
+                      for color, vertex_neighbours in zip(colors, neighbours)]
+        new_colors = {signature: color for color, signature in enumerate(dict.fromkeys(signatures))}
+
+        for v, signature in enumerate(signatures):
+            colors[v] = new_colors[signature]
+
+        # A change has been made if a color got splitted into multiple new colors
+        if len(new_colors) == number_of_colors:
+            break
+        number_of_colors = len(new_colors)
+
+
 def is_distinct(graph: Graph) -> bool:
     """
     Checks if the graph is distinct.
@@ -169,10 +239,8 @@ def do_color_refinement_with_user_input():
             if g1 is not g2 and are_isomorphic(g1, g2):
                 print(f"Isomorphism found between:\n{g1}\nAND\n{g2}\n")
 
-    # create a disjunct union of all the graphs
-    graph = graphs[0]
-    for g in graphs[1:]:
-        graph = graph + g
+    # create a disjunct union of all the graphs, without copying them
+    graph = DisjointUnion(graphs)
 
     # TODO: At this moment the isomorphisms are simply printed to the screen. Maybe save them somewhere.
 
@@ -1,7 +1,8 @@
 import unittest
 import os
 import time
-from color_refinement import load_graph, merge_graphs, refine_colors
+from color_refinement import load_graph, merge_graphs, refine_colors, have_same_neighbours, color_refinement
+from fast_color_refinement import fast_color_refinement
 
 
 class MyTestCase(unittest.TestCase):
@@ -9,6 +10,35 @@ class MyTestCase(unittest.TestCase):
     # def test_something(self):
     #     self.assertEqual(True, False)
 
+    def test_stable_coloring(self):
+        with open('graphs/color refinement/colorref_smallexample_6_15.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        vertices = merge_graphs(graphs)
+        refine_colors(vertices)
+
+        # The coloring is stable: vertices with the same color have the same neighbour colors. The colors are 0..k-1.
+        for v in vertices:
+            for w in vertices:
+                if v.colornum == w.colornum:
+                    self.assertTrue(have_same_neighbours(v, w))
+        self.assertEqual(set(range(37)), set(v.colornum for v in vertices))
+
+    def test_fast_color_refinement(self):
+        # The partition refinement gives the same partition as the round based color refinement
+        for file_name in ('colorref_smallexample_6_15.grl', 'colorref_largeexample_4_1026.grl', 'threepaths40.gr'):
+            colorings = list()
+            for refine in (color_refinement, fast_color_refinement):
+                with open('graphs/color refinement/' + file_name) as f:
+                    graphs = load_graph(f, read_list=True)[0]
+                refine(graphs)
+                cells = dict()
+                for i, v in enumerate(merge_graphs(graphs)):
+                    cells.setdefault(v.colornum, set()).add(i)
+                colorings.append(set(frozenset(cell) for cell in cells.values()))
+                self.assertEqual(set(range(len(cells))), set(cells), file_name)
+            self.assertEqual(colorings[0], colorings[1], file_name)
+
     def test_refinement_time(self):
         graph_files = os.listdir('graphs/color refinement/')
         for graph_file in graph_files:
@@ -0,0 +1,312 @@
+"""
+This module contains colorings of the vertices of graphs that are kept apart from the graphs themselves.
+
+A `Coloring` gives every vertex an int color, like `Vertex.colornum`, but it is owned by the algorithm that uses it
+instead of by the graph. So a graph does not need to be copied to hold another coloring, and many colorings of the same
+graph can exist at once. The vertices are numbered like in a `graph.DisjointUnion`: vertex `v` of a graph that starts
+at `start` in the union is `start + v.id` (or `start + v` for a `compact_graph.CompactGraph`).
+"""
+
+from typing import Sequence, Union
+
+from graph import Graph, DisjointUnion
+from compact_graph import CompactGraph
+
+
+class Coloring(object):
+    """
+    A coloring of the vertices 0..n-1, in which the vertices of every color class (cell) are stored next to each other.
+    `colors` gives the color of every vertex, `order` lists the vertices cell by cell, `position` tells where every
+    vertex is in `order`, and cell `c` consists of `order[start[c]:end[c]]`. The colors are the numbers 0..k-1 of the
+    cells, and a cell can be split in time proportional to the number of vertices that move.
+
+    Every split is recorded on a trail (`parents`, the color that every color was split from), so that a search can
+    refine one coloring in place and undo the splits when it backtracks, instead of copying the coloring.
+
+    For the disjoint union of a pair of graphs, the coloring can keep track of whether it is balanced, see
+    `track_balance`. Refinement then stops as soon as it is not, because the graphs cannot be isomorphic anymore.
+    """
+
+    __slots__ = ('colors', 'order', 'position', 'start', 'end', 'parents', 'counts', 'queued', 'first', 'differences',
+                 'unbalanced')
+
+    def __init__(self, colors: Sequence):
+        """
+        Creates the coloring in which the vertices with the same color form a cell.
+        :param colors: The color of every vertex, which may be any values that can be sorted. The cells are numbered in
+        the order of these colors.
+        """
+        n = len(colors)
+        self.order = sorted(range(n), key=colors.__getitem__)
+        self.position = [0] * n
+        self.colors = [0] * n
+        self.start = list()
+        self.end = list()
+
+        for p, v in enumerate(self.order):
+            if p == 0 or colors[v] != colors[self.order[p - 1]]:
+                if p > 0:
+                    self.end.append(p)
+                self.start.append(p)
+            self.position[v] = p
+            self.colors[v] = len(self.start) - 1
+
+        if n > 0:
+            self.end.append(n)
+        self.parents = [None] * len(self.start)
+
+        # Scratch space of `refine`, which is all zeros outside it. There are at most n colors.
+        self.counts = [0] * n
+        self.queued = bytearray(n)
+
+        self.first = None
+        self.differences = None
+        self.unbalanced = 0
+
+    @classmethod
+    def from_graphs(cls, graphs: Union[list[Union[Graph, CompactGraph]], DisjointUnion]) -> "Coloring":
+        """
+        Creates the start coloring of the vertices of the graphs: the vertices keep their `colornum`, and the vertices
+        without a color (like all vertices of a `CompactGraph`) are colored by their degree. The graphs are not changed.
+        :param graphs: An array with graphs, or a disjoint union view of them.
+        :return: The coloring of the vertices of their union
+        """
+        union = graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs)
+        colors = list()
+        for graph in union.graphs:
+            if isinstance(graph, CompactGraph):
+                colors.extend((1, degree) for degree in graph.degrees)
+            else:
+                colors.extend((1, vertex.degree) if vertex.colornum is None else (0, vertex.colornum)
+                              for vertex in graph)
+        return cls(colors)
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the coloring.
+        :return: The string to approximate the constructor arguments of the `Coloring'
+        """
+        return 'Coloring({})'.format(self.colors)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of colors
+        """
+        return len(self.start)
+
+    def size(self, color: int) -> int:
+        """
+        :param color: The color
+        :return: The number of vertices with the color
+        """
+        return self.end[color] - self.start[color]
+
+    def members(self, color: int) -> list[int]:
+        """
+        :param color: The color
+        :return: The vertices with the color
+        """
+        return self.order[self.start[color]:self.end[color]]
+
+    def copy(self) -> "Coloring":
+        """
+        :return: A copy of the coloring, which can be refined independently of this one
+        """
+        coloring = Coloring.__new__(Coloring)
+        coloring.colors = self.colors[:]
+        coloring.order = self.order[:]
+        coloring.position = self.position[:]
+        coloring.start = self.start[:]
+        coloring.end = self.end[:]
+        coloring.parents = self.parents[:]
+        coloring.counts = [0] * len(self.colors)
+        coloring.queued = bytearray(len(self.colors))
+        coloring.first = self.first
+        coloring.differences = None if self.differences is None else self.differences[:]
+        coloring.unbalanced = self.unbalanced
+        return coloring
+
+    def track_balance(self, n: int):
+        """
+        Keep track of whether the coloring is balanced, when it colors the disjoint union of two graphs: whether every
+        color has as many vertices of the first graph (the vertices 0..n-1) as of the second one. For every color
+        `differences` has the number of vertices of the first graph minus that of the second graph, and `unbalanced`
+        is the number of colors for which this is not 0. These are updated by every split.
+        :param n: The number of vertices of the first graph
+        """
+        self.first = n
+        self.differences = [0] * len(self.colors)
+        for v, color in enumerate(self.colors):
+            self.differences[color] += 1 if v < n else -1
+        self.unbalanced = sum(1 for difference in self.differences if difference != 0)
+
+    def store(self, graphs: Union[list[Graph], DisjointUnion]):
+        """
+        Stores the colors in the `colornum` of the vertices of the graphs.
+        :param graphs: The graphs that are colored, or a disjoint union view of them. These should be `Graph`s, a
+        `CompactGraph` cannot store colors.
+        """
+        for vertex, color in zip(graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs), self.colors):
+            vertex.colornum = color
+
+    def split(self, color: int, vertices: list[int]) -> int:
+        """
+        Give some of the vertices with a color a new color.
+        :param color: The color
+        :param vertices: The vertices, which should be some but not all vertices with the color
+        :return: The new color, which is numbered after all other colors
+        """
+        order, position, colors = self.order, self.position, self.colors
+        new_color = len(self.start)
+        old_end = end = self.end[color]
+
+        # Swap the vertices to the end of the cell, where they form the new cell
+        for v in vertices:
+            end -= 1
+            p = position[v]
+            w = order[end]
+            order[p] = w
+            position[w] = p
+            order[end] = v
+            position[v] = end
+            colors[v] = new_color
+
+        self.end[color] = end
+        self.start.append(end)
+        self.end.append(old_end)
+        self.parents.append(color)
+
+        if self.first is not None:
+            first, differences = self.first, self.differences
+            difference = sum(1 if v < first else -1 for v in vertices)
+            old_difference = differences[color]
+            differences[color] = old_difference - difference
+            differences[new_color] = difference
+            self.unbalanced += (old_difference != difference) - (old_difference != 0) + (difference != 0)
+        return new_color
+
+    def undo(self, number_of_colors: int):
+        """
+        Undo the latest splits, until the coloring has the given number of colors again. A split always takes the end
+        of a cell, so the vertices of the latest color are right after those of the color it was split from.
+        :param number_of_colors: The number of colors before the splits, the length of the coloring at that time
+        """
+        colors, start, end, parents, differences = self.colors, self.start, self.end, self.parents, self.differences
+        while len(start) > number_of_colors:
+            color = parents.pop()
+            for v in self.order[start.pop():end[-1]]:
+                colors[v] = color
+            end[color] = end.pop()
+
+            if differences is not None:
+                difference = differences[len(start)]
+                old_difference = differences[color]
+                differences[color] = old_difference + difference
+                differences[len(start)] = 0
+                self.unbalanced += (old_difference != -difference) - (old_difference != 0) - (difference != 0)
+
+    def refine(self, neighbours: list[list[int]], queue: list[int]):
+        """
+        Refine the coloring until it is stable: until the vertices of every color have equally many neighbours of
+        every color. This is Hopcroft's partition refinement: the colors in the queue are used to split the other
+        colors by the number of neighbours that their vertices have of it. The work for a splitter is proportional to
+        the number of edges at its vertices, and when a color that is not in the queue is split, its largest part does
+        not need to be added to the queue. So every vertex is in a splitter at most O(log n) times, for
+        O((n + m) log n) in total.
+        :param neighbours: The neighbours of every vertex, see `union_neighbours`
+        :param queue: The colors to split with, this list is used as the worklist. The coloring should already be
+        stable with respect to all other colors.
+        If the balance is tracked (see `track_balance`), the refinement stops as soon as the coloring is not balanced,
+        the coloring is not stable then.
+        """
+        start, end, colors = self.start, self.end, self.colors
+        count, in_queue = self.counts, self.queued
+        for color in queue:
+            in_queue[color] = True
+
+        while len(queue) > 0 and self.unbalanced == 0:
+            splitter = queue.pop()
+            in_queue[splitter] = False
+
+            # Count the neighbours in the splitter, only for the vertices that have any
+            touched = list()
+            for u in self.order[start[splitter]:end[splitter]]:
+                for v in neighbours[u]:
+                    if count[v] == 0:
+                        touched.append(v)
+                    count[v] += 1
+
+            touched_colors = dict()
+            for v in touched:
+                touched_colors.setdefault(colors[v], list()).append(v)
+
+            # Split every touched color based on the number of neighbours in the splitter
+            for color, vertices in touched_colors.items():
+                whole = len(vertices) == end[color] - start[color]
+                new_colors = dict()
+                for v in vertices:
+                    new_colors.setdefault(count[v], list()).append(v)
+                if whole and len(new_colors) == 1:
+                    continue
+
+                parts = [new_colors[number] for number in sorted(new_colors)]
+                if whole:
+                    # The first part keeps the color
+                    parts = parts[1:]
+                added = [self.split(color, part) for part in parts]
+
+                # If the color was stable, it is enough to add all but the largest part to the queue
+                if not in_queue[color]:
+                    added.append(color)
+                    added.remove(max(added, key=self.size))
+                for new_color in added:
+                    in_queue[new_color] = True
+                    queue.append(new_color)
+
+            for v in touched:
+                count[v] = 0
+
+        for color in queue:
+            in_queue[color] = False
+        del queue[:]
+
+    def individualize(self, neighbours: list[list[int]], vertices: list[int]):
+        """
+        Give some vertices of a color a new color, and refine the coloring again. The coloring should be stable, so it
+        is enough to refine with the smallest of the two parts of the color, instead of starting over.
+        :param neighbours: The neighbours of every vertex, see `union_neighbours`
+        :param vertices: The vertices, which should all have the same color
+        """
+        color = self.colors[vertices[0]]
+        if len(vertices) < self.size(color):
+            new_color = self.split(color, vertices)
+            self.refine(neighbours, [min(color, new_color, key=self.size)])
+
+
+def stores_colors(graphs: Union[list[Union[Graph, CompactGraph]], DisjointUnion]) -> bool:
+    """
+    :param graphs: An array with graphs, or a disjoint union view of them.
+    :return: Whether colors can be stored in the vertices of all graphs, that is, whether none is a `CompactGraph`
+    """
+    return not any(isinstance(graph, CompactGraph)
+                   for graph in (graphs.graphs if isinstance(graphs, DisjointUnion) else graphs))
+
+
+def union_neighbours(graphs: Union[list[Union[Graph, CompactGraph]], DisjointUnion]) -> list[list[int]]:
+    """
+    Numbers the vertices of the graphs together, like in their disjoint union.
+    :param graphs: An array with graphs, or a disjoint union view of them. The neighbours of a `CompactGraph` are read
+    from its offset and neighbour arrays.
+    :return: The neighbours of every vertex of the union
+    """
+    union = graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs)
+    neighbours = list()
+    for graph, start in zip(union.graphs, union.starts):
+        if isinstance(graph, CompactGraph):
+            offsets, targets = graph.offsets, graph.targets
+            for v in range(len(graph)):
+                neighbours.append([start + u for u in targets[offsets[v]:offsets[v + 1]]])
+        else:
+            for vertex in graph:
+                neighbours.append([start + u.id for u in vertex.neighbours])
+    return neighbours
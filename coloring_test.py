@@ -0,0 +1,159 @@
+import unittest
+
+from auto_morphisms import count_automorphisms
+from branching import count_isomorphism, find_isomorphism
+from color_refinement import color_refinement
+from coloring import Coloring, union_neighbours
+from compact_graph import CompactGraph
+from fast_color_refinement import fast_color_refinement, stable_coloring
+from graph import Graph
+from graph_io import load_graph
+
+
+# The cells of a coloring, to compare colorings of which the colors are numbered differently. Other tests import it.
+def partition(colors: list[int]) -> set[frozenset[int]]:
+    cells = {}
+    for v, color in enumerate(colors):
+        cells.setdefault(color, set()).add(v)
+    return set(frozenset(cell) for cell in cells.values())
+
+
+class ColoringTest(unittest.TestCase):
+
+    def load(self, file_name: str) -> list[Graph]:
+        with open(file_name) as f:
+            return load_graph(f, read_list=True)[0]
+
+    def test_cells(self):
+        coloring = Coloring(['b', 'a', 'b', 'c'])
+        self.assertEqual([1, 0, 1, 2], coloring.colors)
+        self.assertEqual([1, 2, 1], [coloring.size(color) for color in range(len(coloring))])
+        self.assertEqual({0, 2}, set(coloring.members(1)))
+
+        copy = coloring.copy()
+        self.assertEqual(3, copy.split(1, [2]))
+        self.assertEqual([1, 0, 3, 2], copy.colors)
+        self.assertEqual([2], copy.members(3))
+        self.assertEqual([1, 0, 1, 2], coloring.colors)
+
+    def test_refine_without_changing_graphs(self):
+        file_name = 'graphs/color refinement/colorref_smallexample_6_15.grl'
+        graphs = self.load(file_name)
+        expected = partition(color_refinement(self.load(file_name)).colors)
+
+        start = Coloring.from_graphs(graphs)
+        for refine in (color_refinement, fast_color_refinement):
+            coloring = refine(graphs, coloring=start)
+            self.assertEqual(expected, partition(coloring.colors))
+            self.assertEqual([None], list(set(v.colornum for graph in graphs for v in graph)))
+        self.assertEqual(partition([v.degree for graph in graphs for v in graph]), partition(start.colors))
+
+        # Without a start coloring the colors are stored in the vertices
+        coloring = fast_color_refinement(graphs)
+        self.assertEqual(coloring.colors, [v.colornum for graph in graphs for v in graph])
+
+    def test_individualize(self):
+        # Refining from an individualized vertex gives the same partition as refining from scratch
+        graphs = self.load('graphs/branching/torus24.grl')[:2]
+        neighbours = union_neighbours(graphs)
+        coloring = stable_coloring(Coloring.from_graphs(graphs), neighbours)
+        self.assertEqual(1, len(coloring))
+
+        for x in (0, 30, 47):
+            branch = coloring.copy()
+            branch.individualize(neighbours, [x])
+            self.assertEqual(1, len(coloring))
+
+            start = coloring.colors[:]
+            start[x] = len(coloring)
+            self.assertEqual(partition(fast_color_refinement(graphs, coloring=Coloring(start)).colors),
+                             partition(branch.colors))
+
+    def test_undo(self):
+        graphs = self.load('graphs/branching/products72.grl')
+        graphs = [graphs[1], graphs[5]]
+        neighbours = union_neighbours(graphs)
+        coloring = stable_coloring(Coloring.from_graphs(graphs), neighbours)
+        colors = coloring.colors[:]
+
+        coloring.individualize(neighbours, [0, max(coloring.members(coloring.colors[0]))])
+        refined = coloring.colors[:]
+        coloring.individualize(neighbours, [max(coloring.members(coloring.colors[1]))])
+        self.assertLess(len(partition(refined)), len(coloring))
+
+        for expected in (refined, colors):
+            coloring.undo(len(partition(expected)))
+            self.assertEqual(expected, coloring.colors)
+            for color in range(len(coloring)):
+                self.assertEqual(set(v for v in range(len(colors)) if coloring.colors[v] == color),
+                                 set(coloring.members(color)))
+
+    def test_balance(self):
+        # torus24 graphs 0 and 1 are not isomorphic, but color refinement only tells them apart after individualizing
+        graphs = self.load('graphs/branching/torus24.grl')[:2]
+        n = len(graphs[0])
+        neighbours = union_neighbours(graphs)
+        coloring = Coloring.from_graphs(graphs)
+        coloring.track_balance(n)
+        stable_coloring(coloring, neighbours)
+        self.assertEqual(0, coloring.unbalanced)
+        self.assertEqual([0] * len(coloring), coloring.differences[:len(coloring)])
+
+        number_of_colors = len(coloring)
+        coloring.individualize(neighbours, [0, n])
+        differences = [coloring.differences[color] for color in range(len(coloring))]
+        self.assertLess(0, coloring.unbalanced)
+        self.assertEqual(sum(1 for difference in differences if difference != 0), coloring.unbalanced)
+        self.assertEqual([False] * len(coloring.queued), [bool(queued) for queued in coloring.queued])
+
+        coloring.undo(number_of_colors)
+        self.assertEqual(0, coloring.unbalanced)
+        self.assertEqual([0] * len(coloring.differences), coloring.differences)
+
+        # Graphs with different degrees are unbalanced from the start, and are not refined at all
+        coloring = Coloring([0, 0, 1, 0, 1, 1])
+        coloring.track_balance(3)
+        self.assertEqual(2, coloring.unbalanced)
+        self.assertEqual(2, len(stable_coloring(coloring, [[1], [0], [], [4], [3, 5], [4]])))
+
+    def test_compact_graph(self):
+        # Compact graphs are numbered by their offset and neighbour arrays, without converting them to a `Graph`
+        graphs = self.load('graphs/branching/torus24.grl')
+        with open('graphs/branching/torus24.grl') as f:
+            compact_graphs = load_graph(f, graph_class=CompactGraph, read_list=True)[0]
+
+        mixed = [compact_graphs[0], graphs[3]]
+        self.assertEqual(union_neighbours(graphs[:1] + graphs[3:4]), union_neighbours(mixed))
+        self.assertEqual(Coloring.from_graphs(graphs[:1] + graphs[3:4]).colors, Coloring.from_graphs(mixed).colors)
+        self.assertEqual(96, count_isomorphism(compact_graphs[0], compact_graphs[3]))
+        self.assertEqual(96, count_automorphisms(compact_graphs[0]))
+
+        # Refinement of only compact graphs starts from their degrees, like for graphs without colors
+        file_name = 'graphs/color refinement/colorref_smallexample_6_15.grl'
+        expected = partition(fast_color_refinement(self.load(file_name)[:2]).colors)
+        with open(file_name) as f:
+            compact_graphs = load_graph(f, graph_class=CompactGraph, read_list=True)[0][:2]
+        for refine in (color_refinement, fast_color_refinement):
+            self.assertEqual(expected, partition(refine(compact_graphs).colors))
+
+    def test_shared_graph(self):
+        # Many colorings of one graph: the graph does not need to be copied for the search
+        graph = self.load('graphs/branching/cubes3.grl')[0]
+        self.assertEqual(48, count_isomorphism(graph, graph))
+        self.assertEqual(48, count_automorphisms(graph))
+        self.assertEqual([None], list(set(v.colornum for v in graph)))
+
+        # Only the automorphisms that keep a vertex in place
+        colors = [0] * len(graph)
+        colors[0] = 1
+        self.assertEqual(6, count_automorphisms(graph, Coloring(colors)))
+        self.assertEqual(6, count_isomorphism(graph, graph, coloring=Coloring(colors + colors)))
+
+        isomorphism = find_isomorphism(graph, graph, Coloring(colors + colors))
+        n = len(graph)
+        self.assertEqual(n, len(isomorphism))
+        self.assertEqual(isomorphism.colors[0], isomorphism.colors[n])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,367 @@
+"""
+This module contains a compact, array-backed representation of graphs.
+
+A `CompactGraph` numbers its vertices 0..n-1 and stores the adjacency in compressed sparse row (CSR) form: the
+neighbours of vertex `v` are `targets[offsets[v]:offsets[v + 1]]`. Next to that the original edge list is kept, so a
+`CompactGraph` can be converted to and from a `graph.Graph` without losing vertex labels, edge order or weights.
+"""
+
+from array import array
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from graph import Graph, GraphError, Vertex
+
+
+class CompactGraph(object):
+    """
+    An immutable graph with integer vertices 0..n-1 and flat offset/neighbour arrays.
+    Like `Vertex.neighbours`, the neighbours of a vertex are the distinct other ends of its incident edges (in both
+    directions for directed graphs), and like `Vertex.degree`, the degree is the number of incident edges.
+    """
+
+    __slots__ = ('_n', '_directed', '_simple', '_tails', '_heads', '_weights', '_labels', '_offsets', '_targets',
+                 '_degrees', '_adjacency', '_edge_index')
+
+    # Use a bit matrix for the adjacency index if it takes at most this many bits per (directed) adjacency
+    DENSE_BITS_PER_ADJACENCY = 64
+
+    def __init__(self, n: int, tails: Iterable[int], heads: Iterable[int], weights: Optional[Iterable] = None,
+                 directed: bool = False, simple: bool = False, labels: Optional[Iterable] = None):
+        """
+        Creates a compact graph from an edge list.
+        :param n: The number of vertices
+        :param tails: For every edge, the index of its tail
+        :param heads: For every edge, the index of its head
+        :param weights: Optional, for every edge its weight
+        :param directed: Whether the graph should behave as a directed graph.
+        :param simple: Whether the graph is a simple graph, that is, it does not have multi-edges or loops.
+        :param labels: Optional, for every vertex its label. By default vertex `v` has label `v`.
+        """
+        self._n = n
+        self._directed = directed
+        self._simple = simple
+        self._tails = array('i', tails)
+        self._heads = array('i', heads)
+
+        if len(self._tails) != len(self._heads):
+            raise GraphError('Every edge needs both a tail and a head')
+
+        self._weights = None if weights is None else list(weights)
+        if self._weights is not None and all(weight is None for weight in self._weights):
+            self._weights = None
+
+        self._labels = None if labels is None else list(labels)
+        if self._labels is not None and self._labels == list(range(n)):
+            self._labels = None
+
+        self._build_adjacency()
+        self._adjacency = None
+        self._edge_index = None
+
+    def _build_adjacency(self):
+        """
+        For internal use only; builds the offset and neighbour arrays from the edge list with a counting sort.
+        """
+        n = self._n
+        counts = [0] * (n + 1)
+
+        for tail, head in zip(self._tails, self._heads):
+            if not (0 <= tail < n and 0 <= head < n):
+                raise GraphError('Edge ({}, {}) refers to a vertex that is not in the graph'.format(tail, head))
+            counts[tail + 1] += 1
+            if tail != head:
+                counts[head + 1] += 1
+
+        for v in range(n):
+            counts[v + 1] += counts[v]
+
+        fill = counts[:n]
+        targets = array('i', [0]) * counts[n]
+        for tail, head in zip(self._tails, self._heads):
+            targets[fill[tail]] = head
+            fill[tail] += 1
+            if tail != head:
+                targets[fill[head]] = tail
+                fill[head] += 1
+
+        # The degree counts incident edges, the neighbours are distinct vertices: remove repeated neighbours.
+        self._degrees = array('i', (counts[v + 1] - counts[v] for v in range(n)))
+        offsets = array('i', [0]) * (n + 1)
+        seen = [-1] * n
+        write = 0
+        for v in range(n):
+            offsets[v] = write
+            for k in range(counts[v], counts[v + 1]):
+                u = targets[k]
+                if seen[u] != v:
+                    seen[u] = v
+                    targets[write] = u
+                    write += 1
+        offsets[n] = write
+
+        del targets[write:]
+        self._offsets = offsets
+        self._targets = targets
+
+    @classmethod
+    def from_arrays(cls, n: int, tails: Sequence[int], heads: Sequence[int], offsets: Sequence[int],
+                    targets: Sequence[int], degrees: Sequence[int], weights: Optional[List] = None,
+                    directed: bool = False, simple: bool = False) -> "CompactGraph":
+        """
+        Creates a compact graph from its edge list and its offset, neighbour and degree arrays, as they are returned by
+        the properties of another compact graph. The arrays are used as they are, without copying or validating them,
+        so they may for instance be memoryviews into a memory-mapped file.
+        :param n: The number of vertices
+        :param tails: For every edge, the index of its tail
+        :param heads: For every edge, the index of its head
+        :param offsets: The offset array, of length n + 1
+        :param targets: The flat neighbour array
+        :param degrees: For every vertex its degree
+        :param weights: Optional, for every edge its weight
+        :param directed: Whether the graph should behave as a directed graph.
+        :param simple: Whether the graph is a simple graph, that is, it does not have multi-edges or loops.
+        :return: The compact graph
+        """
+        graph = cls.__new__(cls)
+        graph._n = n
+        graph._directed = directed
+        graph._simple = simple
+        graph._tails = tails
+        graph._heads = heads
+        graph._weights = weights
+        graph._labels = None
+        graph._offsets = offsets
+        graph._targets = targets
+        graph._degrees = degrees
+        graph._adjacency = None
+        graph._edge_index = None
+        return graph
+
+    @classmethod
+    def from_graph(cls, graph: Graph) -> "CompactGraph":
+        """
+        Creates a compact copy of a `Graph`. Vertex `v` of the result is the vertex with id `v`.
+        :param graph: The graph to copy
+        :return: The compact graph
+        """
+        vertices = graph.vertices
+        edges = graph.edges
+
+        return cls(len(vertices),
+                   (edge.tail.id for edge in edges),
+                   (edge.head.id for edge in edges),
+                   [edge.weight for edge in edges],
+                   directed=graph.directed, simple=graph.simple,
+                   labels=[vertex.label for vertex in vertices])
+
+    def to_graph(self, graph_class=Graph) -> Graph:
+        """
+        Creates a `Graph` (or subclass) with the same vertices, labels and edges as this compact graph.
+        :param graph_class: The class of the graph, `Graph` by default.
+        :return: The graph
+        """
+        graph = graph_class(self._directed, simple=self._simple)
+
+        if self._labels is None:
+            vertices = [Vertex(graph) for _ in range(self._n)]
+        else:
+            vertices = [Vertex(graph, label) for label in self._labels]
+
+        for vertex in vertices:
+            graph.add_vertex(vertex)
+
+        graph.add_edges_from(self._tails, self._heads, self._weights)
+
+        return graph
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the CompactGraph.
+        :return: The string to approximate the constructor arguments of the `CompactGraph'
+        """
+        return 'CompactGraph(directed={}, simple={}, #edges={}, #vertices={})'.format(
+            self._directed, self._simple, len(self._tails), self._n)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of vertices of the graph
+        """
+        return self._n
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        :return: Returns an iterator for the vertices of the graph
+        """
+        return iter(range(self._n))
+
+    @property
+    def directed(self) -> bool:
+        """
+        Whether the graph behaves as a directed graph
+        :return: Whether the graph is directed
+        """
+        return self._directed
+
+    @property
+    def simple(self) -> bool:
+        """
+        Whether the graph is a simple graph, that is, it does not have multi-edges or loops.
+        :return: Whether the graph is simple
+        """
+        return self._simple
+
+    @property
+    def vertices(self) -> range:
+        """
+        :return: The vertices of the graph, which are the integers 0..n-1
+        """
+        return range(self._n)
+
+    @property
+    def edges(self) -> List[Tuple[int, int, object]]:
+        """
+        :return: The edges of the graph as (tail, head, weight) triples, in the order they were added
+        """
+        if self._weights is None:
+            return [(tail, head, None) for tail, head in zip(self._tails, self._heads)]
+        return list(zip(self._tails, self._heads, self._weights))
+
+    @property
+    def tails(self) -> array:
+        """
+        :return: For every edge the index of its tail
+        """
+        return self._tails
+
+    @property
+    def heads(self) -> array:
+        """
+        :return: For every edge the index of its head
+        """
+        return self._heads
+
+    @property
+    def weights(self) -> Optional[list]:
+        """
+        :return: For every edge its weight, or None if no edge has a weight
+        """
+        return self._weights
+
+    @property
+    def offsets(self) -> array:
+        """
+        :return: The offset array, of length n + 1
+        """
+        return self._offsets
+
+    @property
+    def targets(self) -> array:
+        """
+        :return: The flat neighbour array
+        """
+        return self._targets
+
+    @property
+    def degrees(self) -> array:
+        """
+        :return: For every vertex its degree
+        """
+        return self._degrees
+
+    def label(self, v: int):
+        """
+        Returns the label of vertex `v`.
+        :param v: The vertex
+        :return: The label of the vertex
+        """
+        return v if self._labels is None else self._labels[v]
+
+    def neighbours(self, v: int) -> array:
+        """
+        Returns the neighbours of vertex `v`.
+        :param v: The vertex
+        :return: The neighbours of the vertex
+        """
+        return self._targets[self._offsets[v]:self._offsets[v + 1]]
+
+    def degree(self, v: int) -> int:
+        """
+        Returns the degree of vertex `v`, that is, the number of edges incident with it.
+        :param v: The vertex
+        :return: The degree of the vertex
+        """
+        return self._degrees[v]
+
+    def _adjacency_index(self):
+        """
+        For internal use only; builds the adjacency index on first use. For dense graphs this is a bit matrix in a
+        bytearray, with a row of `(n + 7) // 8` bytes per vertex in which bit `v` is set for every neighbour `v`.
+        Otherwise it is a set with `u * n + v` for every adjacent pair `u`, `v`. Both are looked up in O(1) time (a
+        bitset per vertex as a Python int would not be: shifting or masking it takes time linear in its length).
+        :return: The adjacency index
+        """
+        if self._adjacency is None:
+            n = self._n
+
+            if self._directed:
+                pairs = list(zip(self._tails, self._heads))
+            else:
+                offsets, targets = self._offsets, self._targets
+                pairs = [(u, targets[k]) for u in range(n) for k in range(offsets[u], offsets[u + 1])]
+
+            if n * n <= self.DENSE_BITS_PER_ADJACENCY * max(len(pairs), 1):
+                stride = (n + 7) >> 3
+                bits = bytearray(n * stride)
+                for u, v in pairs:
+                    bits[u * stride + (v >> 3)] |= 1 << (v & 7)
+                self._adjacency = bits
+            else:
+                self._adjacency = set(u * n + v for u, v in pairs)
+
+        return self._adjacency
+
+    def _check_pair(self, u: int, v: int):
+        """
+        For internal use only; the indices `u * n + v` of the adjacency and edge indices are only unique for vertices
+        of the graph, so anything else is rejected instead of reading the entry of another pair.
+        :param u: One vertex
+        :param v: The other vertex
+        """
+        if not (0 <= u < self._n and 0 <= v < self._n):
+            raise GraphError('Pair ({}, {}) refers to a vertex that is not in the graph'.format(u, v))
+
+    def is_adjacent(self, u: int, v: int) -> bool:
+        """
+        Returns True iff vertices `u` and `v` are adjacent. If the graph is directed, the direction of the edges is
+        respected.
+        :param u: One vertex
+        :param v: The other vertex
+        :return: Whether the vertices are adjacent
+        :raises GraphError: If `u` or `v` is not a vertex of the graph
+        """
+        self._check_pair(u, v)
+        adjacency = self._adjacency_index()
+
+        if type(adjacency) is bytearray:
+            return (adjacency[u * ((self._n + 7) >> 3) + (v >> 3)] >> (v & 7)) & 1 == 1
+
+        return u * self._n + v in adjacency
+
+    def find_edge(self, u: int, v: int) -> Set[int]:
+        """
+        Tries to find edges between two vertices.
+        :param u: One vertex
+        :param v: The other vertex
+        :return: The set of indices (into `edges`) of the edges incident with both `u` and `v`
+        :raises GraphError: If `u` or `v` is not a vertex of the graph
+        """
+        self._check_pair(u, v)
+        if self._edge_index is None:
+            n = self._n
+            self._edge_index = {}
+            for index, (tail, head) in enumerate(zip(self._tails, self._heads)):
+                self._edge_index.setdefault(tail * n + head, set()).add(index)
+                if tail != head:
+                    self._edge_index.setdefault(head * n + tail, set()).add(index)
+
+        return set(self._edge_index.get(u * self._n + v, ()))
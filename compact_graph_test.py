@@ -0,0 +1,100 @@
+import io
+import unittest
+
+from branching import count_isomorphism
+from color_refinement import color_refinement, compact_color_refinement
+from coloring_test import partition
+from compact_graph import CompactGraph
+from graph import Graph, GraphError, UnsafeGraph
+from graph_io import load_graph, save_graph
+
+
+class CompactGraphTest(unittest.TestCase):
+
+    def test_adjacency(self):
+        # A triangle with a double edge and a loop
+        graph = CompactGraph(4, [0, 1, 2, 0, 3], [1, 2, 0, 1, 3], [None, 5, None, None, None])
+        self.assertEqual(4, len(graph))
+        self.assertEqual([1, 2], sorted(graph.neighbours(0)))
+        self.assertEqual(3, graph.degree(0))
+        self.assertEqual([3], list(graph.neighbours(3)))
+        self.assertEqual(1, graph.degree(3))
+        self.assertEqual((1, 2, 5), graph.edges[1])
+
+    def test_adjacency_index(self):
+        with open('graphs/branching/cographs1.grl') as f:
+            graph = load_graph(f, read_list=True)[0][0]
+
+        class DenseCompactGraph(CompactGraph):
+            DENSE_BITS_PER_ADJACENCY = 1 << 30
+
+        class SparseCompactGraph(CompactGraph):
+            DENSE_BITS_PER_ADJACENCY = 0
+
+        for graph_class in (DenseCompactGraph, SparseCompactGraph):
+            compact = graph_class.from_graph(graph)
+            vertices = graph.vertices
+            for u in range(0, len(graph), 7):
+                for v in range(len(graph)):
+                    self.assertEqual(graph.is_adjacent(vertices[u], vertices[v]), compact.is_adjacent(u, v))
+                    self.assertEqual(len(graph.find_edge(vertices[u], vertices[v])), len(compact.find_edge(u, v)))
+
+            # Pairs out of range are rejected, instead of reading another pair: (0, 5) is where the loop (1, 1) is
+            compact = graph_class(4, [0, 1], [1, 1])
+            self.assertTrue(compact.is_adjacent(1, 1))
+            for u, v in ((0, 5), (0, 9), (-1, 1), (4, 0)):
+                self.assertRaises(GraphError, compact.is_adjacent, u, v)
+                self.assertRaises(GraphError, compact.find_edge, u, v)
+
+        directed = CompactGraph(3, [0, 1], [1, 1], directed=True)
+        self.assertTrue(directed.is_adjacent(0, 1))
+        self.assertFalse(directed.is_adjacent(1, 0))
+        self.assertTrue(directed.is_adjacent(1, 1))
+        self.assertEqual({0}, directed.find_edge(1, 0))
+
+    def test_graph_round_trip(self):
+        with open('graphs/branching/trees11.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        for graph in graphs:
+            compact = CompactGraph.from_graph(graph)
+            for graph_class in (Graph, UnsafeGraph):
+                copy = compact.to_graph(graph_class)
+                self.assertIsInstance(copy, graph_class)
+                self.assertEqual([v.label for v in graph.vertices], [v.label for v in copy.vertices])
+                self.assertEqual(str(graph), str(copy))
+                for v, w in zip(graph.vertices, copy.vertices):
+                    self.assertEqual(v.degree, w.degree)
+
+    def test_load_and_save(self):
+        with open('graphs/color refinement/colorref_smallexample_4_7.grl') as f:
+            graphs = load_graph(f, graph_class=CompactGraph, read_list=True)[0]
+        with open('graphs/color refinement/colorref_smallexample_4_7.grl') as f:
+            expected = load_graph(f, read_list=True)[0]
+
+        self.assertEqual([str(g) for g in expected], [str(g.to_graph()) for g in graphs])
+
+        buffer_1, buffer_2 = io.StringIO(), io.StringIO()
+        save_graph(graphs, buffer_1)
+        save_graph(expected, buffer_2)
+        self.assertEqual(buffer_2.getvalue(), buffer_1.getvalue())
+
+    def test_color_refinement(self):
+        with open('graphs/color refinement/colorref_smallexample_6_15.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        colors = compact_color_refinement([CompactGraph.from_graph(graph) for graph in graphs])
+        color_refinement(graphs)
+
+        expected = [v.colornum for graph in graphs for v in graph.vertices]
+        self.assertEqual(partition(expected), partition([color for graph in colors for color in graph]))
+
+    def test_count_isomorphism(self):
+        with open('graphs/branching/trees11.grl') as f:
+            graphs = load_graph(f, graph_class=CompactGraph, read_list=True)[0]
+
+        self.assertEqual(6, count_isomorphism(graphs[0], graphs[3]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,25 +3,64 @@ This program combines all algorithms that have been written during the project w
 It is able to automatically recognize files based on their naming and takes the appropriate actions.
 """
 
-from graph import Graph
-from graph_io import load_graph
+import os
+from typing import IO, Iterable
+
+from graph import Graph, DisjointUnion
+from graph_io import load_graph, iter_graph6
+from fast_color_refinement import fast_color_refinement
 from branching import count_isomorphism, count_ismorphism_2
 from auto_morphisms import count_automorphisms
 
+# Parsed graphs are cached here, so running the same instance again does not parse it again
+CACHE_DIR = '.graph_cache'
+
+
+def read_graphs(f: IO[str], graph_name: str, lazy: bool = True) -> Iterable[Graph]:
+    """
+    Read the graphs from a delivery file: a graph list, or graphs in graph6 or sparse6 format (one per line) if the
+    name ends with .g6 or .s6. The file may be compressed, for instance as basicGI1.grl.gz.
+    :param f: The file
+    :param graph_name: The name of the file
+    :param lazy: Whether to read the graphs one at a time, while they are used. Otherwise they are read at once, and a
+    graph list is read from the cache (see `CACHE_DIR`) if the same file was read before.
+    :return: An iterator over the graphs, or the list of graphs if not `lazy`
+    """
+    base, extension = os.path.splitext(graph_name)
+    if extension in ('.gz', '.bz2', '.xz', '.zst'):
+        graph_name = base
+
+    if graph_name.endswith(('.g6', '.s6')):
+        graphs = iter_graph6(Graph, f)
+        return graphs if lazy else list(graphs)
+    if lazy:
+        return (graph for graph, options in load_graph(f, read_list=True, lazy=True))
+    return load_graph(f, read_list=True, cache_dir=CACHE_DIR)[0]
+
 
 def basic_GI(graphs: list[Graph]) -> None:
     """
     Figure out the equivalence classes between the graphs in the lists.
     :param graphs: A list with graphs
     """
+    # Refine all graphs in one pass over a view of their disjoint union. Graphs of which the refined colors do not
+    # occur equally often cannot be isomorphic, so only graphs with the same color counts need to be branched on.
+    fast_color_refinement(DisjointUnion(graphs))
+    color_counts = [sorted(v.colornum for v in graph) for graph in graphs]
+
     equivalence_classes = []
     for i in range(len(graphs)):
         added = False
         for equivalence_class in equivalence_classes:
-            number_of_isomorphisms = count_ismorphism_2(graphs[equivalence_class[0]] + Graph(False), graphs[i] + Graph(False), [], [])
+            if color_counts[equivalence_class[0]] != color_counts[i]:
+                continue
+            number_of_isomorphisms = count_ismorphism_2(graphs[equivalence_class[0]], graphs[i])
             if number_of_isomorphisms:
                 equivalence_class.append(i)
                 added = True
+                # The first graphs of the classes are not isomorphic to each other, so graph i cannot belong to a later
+                # class: isomorphism is transitive. The other classes do not need to be compared with.
+                break
         if not added:
             equivalence_classes.append([i])
 
@@ -39,34 +78,26 @@ def basic_GIAut(graphs: list[Graph]) -> None:
     basic_Aut(graphs)
 
 
-def basic_Aut(graphs: list[Graph]) -> None:
+def basic_Aut(graphs: Iterable[Graph]) -> None:
     """
     Calculates the number of automorphisms for each graph.
-    :param graphs: A list with graphs
+    The graphs are handled one by one, so they may be read lazily from the file while the first ones are processed.
+    :param graphs: A list (or iterable) with graphs
     """
-    automorphisms = [0 for _ in range(len(graphs))]
-
-    for i in range(len(graphs)):
-        automorphisms[i] = count_isomorphism(graphs[i] + Graph(False), graphs[i] + Graph(False), [], [])
-
     print("Automorphisms:")
-    for i, value in enumerate(automorphisms):
-        print(f"{i}: {value}")
+    for i, graph in enumerate(graphs):
+        print(f"{i}: {count_isomorphism(graph, graph)}")
 
 
-def bonus_Aut(graphs: list[Graph]) -> None:
+def bonus_Aut(graphs: Iterable[Graph]) -> None:
     """
     Calculates the number of automorphisms for each graph.
-    :param graphs: A list with graphs
+    The graphs are handled one by one, so they may be read lazily from the file while the first ones are processed.
+    :param graphs: A list (or iterable) with graphs
     """
-    automorphisms = [0 for _ in range(len(graphs))]
-
-    for i, value in enumerate(graphs):
-        automorphisms[i] = count_automorphisms(value)
-
     print("Automorphisms:")
-    for i, value in enumerate(automorphisms):
-        print(f"{i}: {value}")
+    for i, graph in enumerate(graphs):
+        print(f"{i}: {count_automorphisms(graph)}")
 
 
 if __name__ == '__main__':
@@ -76,19 +107,20 @@ if __name__ == '__main__':
         graph_name = "basicGI1.grl"
 
     try:
-        with open('graphs/delivery/' + graph_name) as f:
-            graphs = load_graph(f, read_list=True)
+        f = open('graphs/delivery/' + graph_name)
     except FileNotFoundError:
         print(f"Unable to open {graph_name}, make sure that it is located in graphs/delivery!")
         exit()
 
-    if "basicGIAut" in graph_name:
-        basic_GIAut(graphs[0])
-    elif "basicGI" in graph_name or "bonusGI" in graph_name:
-        basic_GI(graphs[0])
-    elif "basicAut" in graph_name:
-        basic_Aut(graphs[0])
-    elif "bonusAut" in graph_name:
-        bonus_Aut(graphs[0])
-    else:
-        print(f"The file couldn't be recognized, please adhere to the naming scheme as denoted on Canvas!")
\ No newline at end of file
+    with f:
+        # The equivalence classes need all graphs at once, the automorphisms are counted while the file is read.
+        if "basicGIAut" in graph_name:
+            basic_GIAut(read_graphs(f, graph_name, lazy=False))
+        elif "basicGI" in graph_name or "bonusGI" in graph_name:
+            basic_GI(read_graphs(f, graph_name, lazy=False))
+        elif "basicAut" in graph_name:
+            basic_Aut(read_graphs(f, graph_name))
+        elif "bonusAut" in graph_name:
+            bonus_Aut(read_graphs(f, graph_name))
+        else:
+            print(f"The file couldn't be recognized, please adhere to the naming scheme as denoted on Canvas!")
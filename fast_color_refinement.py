@@ -1,93 +1,51 @@
-from graph import Graph, Vertex
-from color_refinement import are_isomorphic
-from graph_io import load_graph, write_dot
-
-
-def give_start_labelling(graphs: list[Graph]) -> dict[int, list[Vertex]]:
-    """Give every vertex an initial color label and return a dict from color to all vertices with that color."""
-    degree_to_color = dict()
-    color_classes = dict()
-
-    for graph in graphs:
-        for vertex in graph.vertices:
-            if not hasattr(vertex, 'colornum'):
-                if vertex.degree not in degree_to_color:
-                    degree_to_color[vertex.degree] = len(color_classes)
-                vertex.colornum = degree_to_color[vertex.degree]
-
-            color_class = color_classes.get(vertex.colornum, [])
-            color_class.append(vertex)
-            color_classes[vertex.colornum] = color_class
-
-    return color_classes
-
-
-def old_refine(color_classes: dict[int, list[Vertex]], color: int,
-               stack: list[int]):
-
-    # Identify all neighbouring colours
-    neighbours = set()
-    for vertex in color_classes.get(color):
-        for vertex2 in vertex.neighbours:
-            neighbours.add(vertex2.colornum)
-
-    changes = dict()
+from typing import Optional, Union
 
-    # Detect changes for all neighbours based on the amount of neighbours with color color
-    for neighbour in neighbours:
-        vertices = color_classes.get(neighbour)
-        new_colors = dict()
-
-        # Split vertices based on number of neighbours with colour color
-        for vertex in vertices:
-            count = list(v.colornum for v in vertex.neighbours).count(color)
-            result = new_colors.get(count, [])
-            result.append(vertex)
-            new_colors[count] = result
-
-        # Add the changes to the changes dictionary
-        if len(new_colors.keys()) > 1:
-            changes[neighbour] = new_colors.values()
-
-    # Apply all the changes
-    for old_color, new_color_classes in changes.items():
-
-        # Assign the vertices to their new colors
-        for count, new_color_vertices in enumerate(list(new_color_classes)):
-            if count > 0:
-                new_color = len(color_classes.keys())
-                for vertex in new_color_vertices:
-                    vertex.colornum = new_color
-            color_classes[new_color_vertices[0].colornum] = new_color_vertices
-
-        # Add the colors to the queue
-        add_to_queue = new_color_classes
-        # If the original partition was stable leave the biggest partition out of the queue
-        if old_color not in stack:
-            add_to_queue = sorted(add_to_queue, key=lambda x: len(x), reverse=True)[1:]
-        for new_color in add_to_queue:
-            color = new_color[0].colornum
-            if color not in stack:
-                stack.append(color)
+from graph import Graph, DisjointUnion
+from coloring import Coloring, union_neighbours, stores_colors
+from color_refinement import are_isomorphic, check_backend
+from numpy_color_refinement import numpy_refine_graphs
+from graph_io import load_graph, write_dot
 
 
-def fast_color_refinement(graphs: list[Graph]):
-    """Alter the given list of graphs to have color labels reflecting color refinement."""
+def fast_color_refinement(graphs: Union[list[Graph], DisjointUnion], backend: str = 'python',
+                          coloring: Optional[Coloring] = None) -> Coloring:
+    """
+    Does color refinement on the graphs with Hopcroft's partition refinement, see `Coloring.refine`.
+    Without a start coloring, the vertices start with their color, or with their degree if they have none, and the
+    refined colors are stored in the vertices (unless there are compact graphs, which cannot store colors). With a
+    start coloring the graphs are not changed.
+    :param graphs: An array with graphs (which may be `CompactGraph`s), or a disjoint union view of them.
+    :param backend: 'python', or 'numpy' to refine on flat arrays with NumPy (see `numpy_color_refinement`). The numpy
+    backend refines in rounds like `color_refinement`, not with Hopcroft's method, so it gives the same colors but is
+    much slower on graphs that need many rounds, such as long paths: use it for graphs that stabilise in a few rounds.
+    :param coloring: Optional, the start coloring of the vertices of their union. It is not changed.
+    :return: The stable coloring of the vertices of the union
+    """
+    check_backend(backend)
+    if backend == 'numpy':
+        return Coloring(numpy_refine_graphs(graphs, None if coloring is None else coloring.colors))
 
-    # Start with pi = {F, Q\F} = {C0, C1}
-    # For a DFA we would split 2 ways, but in general we can split more efficiently on degree.
-    color_classes = give_start_labelling(graphs)
+    refined = stable_coloring(Coloring.from_graphs(graphs) if coloring is None else coloring.copy(),
+                              union_neighbours(graphs))
+    if coloring is None and stores_colors(graphs):
+        refined.store(graphs)
+    return refined
 
-    # Maintain a queue (or stack) that will be used for refining operations, starting with [0].
-    # The queue is guaranteed to work if all classes are included.
-    add_to_queue = sorted(list(color_classes.values()), key=lambda x: len(x), reverse=True)
-    stack = list(vertices[0].colornum for vertices in add_to_queue)[1:]
 
-    # Refine the stack until it is empty
-    while len(stack) > 0:
-        color = stack[0]
-        stack.pop(0)
-        old_refine(color_classes, color, stack)
+def stable_coloring(coloring: Coloring, neighbours: list[list[int]]) -> Coloring:
+    """
+    Refines a coloring until it is stable.
+    :param coloring: The coloring, which is refined in place
+    :param neighbours: The neighbours of every vertex, see `coloring.union_neighbours`
+    :return: The coloring
+    """
+    # Refine with all colors. If the vertices of every color have equally many neighbours, their number of neighbours
+    # of the largest color follows from the other colors, so that color can be left out.
+    queue = list(range(len(coloring)))
+    if all(len(set(len(neighbours[v]) for v in coloring.members(color))) == 1 for color in queue):
+        queue.remove(max(queue, key=coloring.size))
+    coloring.refine(neighbours, queue)
+    return coloring
 
 
 def do_fast_color_refinement_with_user_input():
@@ -133,10 +91,8 @@ def do_fast_color_refinement_with_user_input():
             if are_isomorphic(g1, g2):
                 print(f"Isomorphism found between:\n{g1}\nAND\n{g2}\n")
 
-    # create a disjunct union of all the graphs
-    graph = graphs[0]
-    for g in graphs[1:]:
-        graph = graph + g
+    # create a disjunct union of all the graphs, without copying them
+    graph = DisjointUnion(graphs)
 
     # TODO: At this moment the isomorphisms are simply printed to the screen. Maybe save them somewhere.
 
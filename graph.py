@@ -4,7 +4,9 @@ This is a module for working with directed and undirected multigraphs.
 # version: 29-01-2015, Paul Bonsma
 # version: 01-02-2017, Pieter Bos, Tariq Bontekoe
 
-from typing import List, Union, Set
+from bisect import bisect_right
+from itertools import repeat
+from typing import Iterable, List, Optional, Tuple, Union, Set
 
 
 class GraphError(Exception):
@@ -26,8 +28,15 @@ class Vertex(object):
     `Vertex` objects have a property `graph` pointing to the graph they are part of,
     and an attribute `label` which can be anything: it is not used for any methods,
     except for `__str__`.
+    Once added to its graph, a vertex has a dense integer `id`: the vertices of a graph have ids 0..n-1 in the order
+    they were added, and `graph.vertex(id)` returns the vertex with that id.
+    The algorithms store their state in the declared fields `colornum` (the color, None if not colored yet),
+    `colortext` (an explicit color for `write_dot`) and `pre_labeled` (a search flag used by `auto_morphisms`).
     """
 
+    __slots__ = ('_graph', '_id', 'label', '_incidence', '_degree', '_neighbour_view', '_incidence_view', 'colornum',
+                 'colortext', 'pre_labeled')
+
     def __init__(self, graph: "Graph", label=None):
         """
         Creates a vertex, part of `graph`, with optional label `label`.
@@ -41,18 +50,24 @@ class Vertex(object):
             label = graph._next_label()
 
         self._graph = graph
+        self._id = None
         self.label = label
         self._incidence = {}
+        self._degree = 0
+        self._neighbour_view = None
+        self._incidence_view = None
+        self.colornum = None
+        self.colortext = None
+        self.pre_labeled = False
 
     def __repr__(self):
         """
         A programmer-friendly representation of the vertex.
         :return: The string to approximate the constructor arguments of the `Vertex'
         """
-        try:
+        if self.colornum is not None:
             return 'Vertex(label={}, color={}, #incident={})'.format(self.label, self.colornum, len(self._incidence))
-        except AttributeError:
-            return 'Vertex(label={}, #incident={})'.format(self.label, len(self._incidence))
+        return 'Vertex(label={}, #incident={})'.format(self.label, len(self._incidence))
 
     def __str__(self) -> str:
         """
@@ -70,15 +85,27 @@ class Vertex(object):
 
     def _add_incidence(self, edge: "Edge"):
         """
-        For internal use only; adds an edge to the incidence map
+        For internal use only; adds an edge to the incidence map, and invalidates the cached adjacency views
         :param edge: The edge that is used to add the incidence
         """
-        other = edge.other_end(self)
+        self._add_incidence_with(edge.other_end(self), edge)
 
-        if other not in self._incidence:
-            self._incidence[other] = set()
+    def _add_incidence_with(self, other: "Vertex", edge: "Edge"):
+        """
+        For internal use only; adds an edge to the incidence map, when its other end is already known
+        :param other: The other end of the edge
+        :param edge: The edge that is used to add the incidence
+        """
+        edge_set = self._incidence.get(other)
+        if edge_set is None:
+            edge_set = self._incidence[other] = set()
+            self._neighbour_view = None
 
-        self._incidence[other].add(edge)
+        # A loop is added twice to the same vertex, but only counts once
+        if edge not in edge_set:
+            edge_set.add(edge)
+            self._degree += 1
+            self._incidence_view = None
 
     @property
     def graph(self) -> "Graph":
@@ -89,39 +116,56 @@ class Vertex(object):
         return self._graph
 
     @property
-    def incidence(self) -> List["Edge"]:
+    def id(self) -> int:
+        """
+        The position of this vertex in its graph, None if it has not been added to the graph yet
+        :return: The id of this vertex
+        """
+        return self._id
+
+    @property
+    def incidence(self) -> Tuple["Edge", ...]:
         """
-        Returns the list of edges incident with the vertex.
-        :return: The list of edges incident with the vertex
+        Returns the edges incident with the vertex. The tuple is cached until an edge is added to the vertex.
+        :return: The edges incident with the vertex
         """
-        result = set()
+        if self._incidence_view is None:
+            result = set()
+
+            for edge_set in self._incidence.values():
+                result |= edge_set
 
-        for edge_set in self._incidence.values():
-            result |= edge_set
+            self._incidence_view = tuple(result)
 
-        return list(result)
+        return self._incidence_view
 
     @property
-    def neighbours(self) -> List["Vertex"]:
+    def neighbours(self) -> Tuple["Vertex", ...]:
         """
-        Returns the list of neighbors of the vertex.
+        Returns the neighbors of the vertex. The tuple is cached until an edge to a new neighbour is added.
         """
-        return list(self._incidence.keys())
+        if self._neighbour_view is None:
+            self._neighbour_view = tuple(self._incidence)
+
+        return self._neighbour_view
 
     @property
     def degree(self) -> int:
         """
-        Returns the degree of the vertex
+        Returns the degree of the vertex, that is, the number of incident edges
         """
-        return sum(map(len, self._incidence.values()))
+        return self._degree
 
 
 class Edge(object):
     """
     Edges have properties `tail` and `head` which point to the end vertices
     (`Vertex` objects). The order of these matters when the graph is directed.
+    Like vertices, edges have the declared fields `colornum` and `colortext` that are used by `write_dot`.
     """
 
+    __slots__ = ('_tail', '_head', '_weight', 'colornum', 'colortext')
+
     def __init__(self, tail: Vertex, head: Vertex, weight=None):
         """
         Creates an edge between vertices `tail` and `head`
@@ -135,6 +179,25 @@ class Edge(object):
         self._tail = tail
         self._head = head
         self._weight = weight
+        self.colornum = None
+        self.colortext = None
+
+    @classmethod
+    def _unchecked(cls, tail: Vertex, head: Vertex, weight=None) -> "Edge":
+        """
+        For internal use only; creates an edge without checking that its ends belong to the same graph
+        :param tail: The tail of the edge
+        :param head: The head of the edge
+        :param weight: The weight of the edge
+        :return: The edge
+        """
+        edge = cls.__new__(cls)
+        edge._tail = tail
+        edge._head = head
+        edge._weight = weight
+        edge.colornum = None
+        edge.colortext = None
+        return edge
 
     def __repr__(self):
         """
@@ -276,6 +339,14 @@ class Graph(object):
         """
         return iter(self._v)
 
+    def vertex(self, id: int) -> "Vertex":
+        """
+        Returns the vertex with the given id.
+        :param id: The id of the vertex, which is its position in `vertices`
+        :return: The vertex
+        """
+        return self._v[id]
+
     def __len__(self) -> int:
         """
         :return: The number of vertices of the graph
@@ -289,7 +360,10 @@ class Graph(object):
         """
         if vertex.graph != self:
             raise GraphError("A vertex must belong to the graph it is added to")
+        if vertex.id is not None:
+            raise GraphError("A vertex can only be added to its graph once")
 
+        vertex._id = len(self._v)
         self._v.append(vertex)
 
     def add_edge(self, edge: "Edge"):
@@ -306,9 +380,12 @@ class Graph(object):
             if self.is_adjacent(edge.tail, edge.head):
                 raise GraphError('No multiedges allowed in simple graphs')
 
-        if edge.tail not in self._v:
+        # Membership is tested with the id, a test on the vertex list would make building a graph quadratic.
+        if edge.tail.graph != self:
+            raise GraphError("A vertex must belong to the graph it is added to")
+        if edge.tail.id is None:
             self.add_vertex(edge.tail)
-        if edge.head not in self._v:
+        if edge.head.id is None:
             self.add_vertex(edge.head)
 
         self._e.append(edge)
@@ -323,32 +400,63 @@ class Graph(object):
         :return: New graph which is a disjoint union of `self' and `other'.
         """
         graph = Graph(self.directed)
-        dict = {}
 
-        # Create new vertices and add them to the new graph
+        # Create new vertices and add them to the new graph, the vertices of `other' get the ids after those of `self'
         for vertex in (self.vertices + other.vertices):
             new_vertex = Vertex(graph, vertex.label)
-            try:
-                new_vertex.colornum = vertex.colornum
-            except AttributeError:
-                pass
-
-            try:
-                new_vertex.pre_labeled = vertex.pre_labeled
-            except AttributeError:
-                pass
-            dict[vertex] = new_vertex
+            new_vertex.colornum = vertex.colornum
+            new_vertex.pre_labeled = vertex.pre_labeled
             graph.add_vertex(new_vertex)
 
         # Add the edges to the new graph
-        for old_edge in (self.edges + other.edges):
-            tail = old_edge.tail
-            head = old_edge.head
-            new_edge = Edge(dict.get(tail), dict.get(head))
-            graph.add_edge(new_edge)
+        shift = len(self)
+        graph.add_edges_from([e.tail.id for e in self.edges] + [e.tail.id + shift for e in other.edges],
+                             [e.head.id for e in self.edges] + [e.head.id + shift for e in other.edges])
 
         return graph
 
+    def add_edges_from(self, tails: Iterable[int], heads: Iterable[int], weights: Optional[Iterable] = None):
+        """
+        Add many edges at once, given by the ids of their ends. Unlike `add_edge`, the vertices must already be part of
+        the graph. The checks in case the graph should stay simple are still done for every edge.
+        :param tails: For every edge, the id of its tail
+        :param heads: For every edge, the id of its head
+        :param weights: Optional, for every edge its weight
+        """
+        tails, heads = list(tails), list(heads)
+        weights = [None] * len(tails) if weights is None else list(weights)
+
+        if not len(tails) == len(heads) == len(weights):
+            raise GraphError('Every edge needs both a tail and a head')
+
+        if len(tails) > 0 and (min(min(tails), min(heads)) < 0 or max(max(tails), max(heads)) >= len(self._v)):
+            raise GraphError('Edges can only be added between vertices of the graph')
+
+        self._add_edges_from(tails, heads, weights)
+
+    def _add_edges_from(self, tails: List[int], heads: List[int], weights: List):
+        """
+        For internal use only; adds the edges of `add_edges_from` once the ids have been checked.
+        """
+        vertices = self._v
+        edges = self._e
+
+        for tail_id, head_id, weight in zip(tails, heads, weights):
+            tail = vertices[tail_id]
+            head = vertices[head_id]
+
+            if self._simple:
+                if tail is head:
+                    raise GraphError('No loops allowed in simple graphs')
+
+                if self.is_adjacent(tail, head):
+                    raise GraphError('No multiedges allowed in simple graphs')
+
+            edge = Edge._unchecked(tail, head, weight)
+            edges.append(edge)
+            tail._add_incidence_with(head, edge)
+            head._add_incidence_with(tail, edge)
+
     def __iadd__(self, other: Union[Edge, Vertex]) -> "Graph":
         """
         Add either an `Edge` or `Vertex` with the += syntax.
@@ -370,12 +478,8 @@ class Graph(object):
         :param v: The other vertex
         :return: The set of edges incident with both `u` and `v`
         """
-        result = u._incidence.get(v, set())
-
-        if not self._directed:
-            result |= v._incidence.get(u, set())
-
-        return set(result)
+        # The incidence map of a vertex is indexed by the other end, and both ends register every edge.
+        return set(u._incidence.get(v, ()))
 
     def is_adjacent(self, u: "Vertex", v: "Vertex") -> bool:
         """
@@ -385,7 +489,12 @@ class Graph(object):
         :param v: The other vertex
         :return: Whether the vertices are adjacent
         """
-        return v in u.neighbours and (not self.directed or any(e.head == v for e in u.incidence))
+        edges = u._incidence.get(v)
+
+        if edges is None:
+            return False
+
+        return not self._directed or any(e.head is v for e in edges)
 
 
 class UnsafeGraph(Graph):
@@ -398,6 +507,7 @@ class UnsafeGraph(Graph):
         return self._e
 
     def add_vertex(self, vertex: "Vertex"):
+        vertex._id = len(self._v)
         self._v.append(vertex)
 
     def add_edge(self, edge: "Edge"):
@@ -406,6 +516,9 @@ class UnsafeGraph(Graph):
         edge.head._add_incidence(edge)
         edge.tail._add_incidence(edge)
 
+    def add_edges_from(self, tails: Iterable[int], heads: Iterable[int], weights: Optional[Iterable] = None):
+        self._add_edges_from(tails, heads, repeat(None) if weights is None else weights)
+
     def find_edge(self, u: "Vertex", v: "Vertex") -> Set["Edge"]:
         left = u._incidence.get(v, None)
         right = None
@@ -426,3 +539,128 @@ class UnsafeGraph(Graph):
 
     def is_adjacent(self, u: "Vertex", v: "Vertex") -> bool:
         return v in u._incidence or (not self._directed and u in v._incidence)
+
+
+class DisjointUnion(object):
+    """
+    A read-only view of the disjoint union of several graphs, which does not copy any vertex or edge.
+    The vertices of the union are the vertices of the graphs, in order. For graphs with integer vertices 0..n-1 (like
+    `compact_graph.CompactGraph`), vertex `v` of the k-th graph is vertex `starts[k] + v` of the union.
+    """
+
+    def __init__(self, graphs: List):
+        """
+        Creates the union of the given graphs.
+        :param graphs: The graphs, which may be `Graph` objects or graphs with integer vertices
+        """
+        self._graphs = list(graphs)
+        self._starts = []
+
+        n = 0
+        for graph in self._graphs:
+            self._starts.append(n)
+            n += len(graph)
+        self._n = n
+
+    def __repr__(self):
+        """
+        A programmer-friendly representation of the union.
+        :return: The string to approximate the constructor arguments of the `DisjointUnion'
+        """
+        return 'DisjointUnion(#graphs={}, #vertices={})'.format(len(self._graphs), self._n)
+
+    def __len__(self) -> int:
+        """
+        :return: The number of vertices of the union
+        """
+        return self._n
+
+    def __iter__(self):
+        """
+        :return: Returns an iterator for the vertices of the union
+        """
+        for graph, start in zip(self._graphs, self._starts):
+            if isinstance(graph, Graph):
+                yield from graph
+            else:
+                yield from range(start, start + len(graph))
+
+    @property
+    def graphs(self) -> List:
+        """
+        :return: The graphs of the union
+        """
+        return list(self._graphs)
+
+    @property
+    def starts(self) -> List[int]:
+        """
+        :return: For every graph, the position of its first vertex in the union
+        """
+        return list(self._starts)
+
+    @property
+    def directed(self) -> bool:
+        """
+        :return: Whether the graphs of the union are directed
+        """
+        return any(graph.directed for graph in self._graphs)
+
+    @property
+    def vertices(self) -> List:
+        """
+        :return: The list of vertices of the union
+        """
+        return list(self)
+
+    @property
+    def edges(self) -> List:
+        """
+        :return: The list of edges of the union. Edges of graphs with integer vertices are (tail, head, weight) triples.
+        """
+        result = []
+        for graph, start in zip(self._graphs, self._starts):
+            if isinstance(graph, Graph):
+                result += graph.edges
+            else:
+                result += [(tail + start, head + start, weight) for tail, head, weight in graph.edges]
+        return result
+
+    def locate(self, v: int) -> Tuple[int, int]:
+        """
+        Finds the graph a vertex (given by its position in the union) belongs to.
+        :param v: The position of the vertex in the union
+        :return: The index of the graph, and the position of the vertex within that graph
+        """
+        if not 0 <= v < self._n:
+            raise GraphError('Vertex {} is not in the union'.format(v))
+
+        index = bisect_right(self._starts, v) - 1
+        return index, v - self._starts[index]
+
+    def neighbours(self, v: int) -> List[int]:
+        """
+        Returns the neighbours of a vertex of a graph with integer vertices, as positions in the union.
+        :param v: The position of the vertex in the union
+        :return: The neighbours of the vertex
+        """
+        index, local = self.locate(v)
+        start = self._starts[index]
+        return [start + u for u in self._graphs[index].neighbours(local)]
+
+    def degree(self, v: int) -> int:
+        """
+        Returns the degree of a vertex of a graph with integer vertices.
+        :param v: The position of the vertex in the union
+        :return: The degree of the vertex
+        """
+        index, local = self.locate(v)
+        return self._graphs[index].degree(local)
+
+    def split(self, values: List) -> List[List]:
+        """
+        Splits a list with a value for every vertex of the union into a list for every graph.
+        :param values: The values, in the order of the vertices of the union
+        :return: For every graph the list of values of its vertices
+        """
+        return [values[start:start + len(graph)] for graph, start in zip(self._graphs, self._starts)]
@@ -9,14 +9,149 @@ Includes functions for reading and writing graphs, in a very simple readable for
 # updated 5-2-2015: no black fill color used, when more than numcolors**2 vertices.
 # updated 29-1-2017: pep8 reformat, general improvements
 
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import mmap
+import os
+import re
+import struct
 import sys
-from typing import IO, Tuple, List, Union
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import IO, Iterator, Optional, Tuple, List, Union
 
-from graph import Graph, Edge
+from graph import Graph, GraphError, DisjointUnion
+from compact_graph import CompactGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 DEFAULT_COLOR_SCHEME = "paired12"
 NUM_COLORS = 12
 
+# The number of characters that the bulk parser reads at once
+CHUNK_SIZE = 1 << 20
+
+# The number of lines that the writers collect before writing them at once
+WRITE_BUFFER_LINES = 1 << 14
+
+# A run of edge lines `u,v` or `u,v:w` (with `\n` or `\r\n` line endings), and a single edge within such a run
+_EDGE_LINES = re.compile(r'(?:[ \t]*\d+[ \t]*,[ \t]*\d+[ \t]*(?::[ \t]*[+-]?\d+[ \t]*)?\r?\n)*')
+_EDGE = re.compile(r'(\d+)[ \t]*,[ \t]*(\d+)[ \t]*(?::[ \t]*([+-]?\d+))?')
+# A field of a list of numbers that is not a single number: an empty one, or one with a space inside a number
+_BAD_FIELD = re.compile(r'\d[ \t]+\d|(?:^|,)[ \t]*(?:,|$)')
+
+# The binary graph list format (see `write_binary_graph_list`). All numbers are little-endian.
+BINARY_MAGIC = b'GRLB'
+BINARY_VERSION = 1
+# magic, version, number of graphs, position and length of the options
+_BINARY_HEADER = struct.Struct('<4sIQQQ')
+# n, number of edges, number of neighbour entries, directed, simple, and the positions of the tail, head, offset,
+# neighbour, degree, weight and weight mask arrays (the last two are 0 if no edge has a weight)
+_BINARY_ENTRY = struct.Struct('<QQQIIQQQQQQQ')
+
+# The magic bytes at the start of compressed files, see `text_stream`
+_COMPRESSION_MAGIC = [(b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'), (b'\x28\xb5\x2f\xfd', 'zstd')]
+
+# The default maximum size in bytes of a cache directory, see `read_cached_graph_list`
+CACHE_SIZE = 256 << 20
+# The age in seconds after which a temporary file in a cache directory is left behind by a process that was killed
+# while writing an entry, rather than being written by another process, see `evict_cache`
+STALE_TEMPORARY_AGE = 60 * 60
+
+# graph6 and sparse6 store 6 bits per printable character 63..126, and start a file with an optional header
+_SIX_BITS = [format(value, '06b') for value in range(64)]
+_GRAPH6_CHARACTERS = bytes(range(63, 127))
+_GRAPH6_HEADERS = ('>>graph6<<', '>>sparse6<<')
+_SUBTRACT_63 = bytes((value - 63) % 256 for value in range(256))
+_ADD_63 = bytes((value + 63) % 256 for value in range(256))
+
+
+def decompress(buffer: IO[bytes], compression: str) -> IO[bytes]:
+    """
+    Decompress a binary file as a stream.
+    :param buffer: The compressed file
+    :param compression: The compression, 'gzip', 'bz2', 'xz' or 'zstd' (which needs Python 3.14)
+    :return: The decompressed file
+    """
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=buffer, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(buffer)
+    if compression == 'xz':
+        return lzma.LZMAFile(buffer)
+
+    try:
+        from compression import zstd
+    except ImportError:
+        raise GraphError('Reading zstd compressed files needs Python 3.14 or later')
+    return zstd.ZstdFile(buffer)
+
+
+class _TextReader(io.TextIOWrapper):
+    """
+    A text stream over a binary file that translates the line endings like files opened in text mode, but leaves the
+    binary file open: closing (or collecting) the text stream only detaches it from the file.
+    """
+
+    def close(self):
+        try:
+            self.detach()
+        except ValueError:
+            # Already detached
+            pass
+
+
+def text_stream(f: IO) -> IO[str]:
+    """
+    Returns a text stream with the content of a file. If the file starts with the magic bytes of gzip, bzip2, xz or
+    zstd, it is decompressed while it is read.
+    :param f: The file, in text or binary mode. A text file is only checked if it has a binary buffer (like files
+    opened with `open` and `sys.stdin`) and nothing has been read from it yet. Binary files are decoded as UTF-8.
+    Like in text mode, `\r\n` and `\r` line endings are read as `\n`.
+    :return: The text stream, which is `f` itself for uncompressed text files. The file `f` stays open when the text
+    stream is closed.
+    """
+    if isinstance(f, io.TextIOBase):
+        buffer = getattr(f, 'buffer', None)
+        encoding = f.encoding
+        if buffer is None:
+            return f
+        try:
+            if f.tell() != 0:
+                return f
+        except OSError:
+            # A pipe, which cannot tell its position
+            pass
+    else:
+        buffer = f
+        encoding = 'utf-8'
+
+    if hasattr(buffer, 'peek'):
+        head = buffer.peek(6)[:6]
+    elif buffer.seekable():
+        position = buffer.tell()
+        head = buffer.read(6)
+        buffer.seek(position)
+    else:
+        head = b''
+
+    for magic, compression in _COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return _TextReader(decompress(buffer, compression), encoding=encoding, newline=None)
+
+    if buffer is f:
+        return _TextReader(f, encoding=encoding, newline=None)
+    return f
+
 
 def read_line(f: IO[str]) -> str:
     """
@@ -35,7 +170,7 @@ def read_line(f: IO[str]) -> str:
 def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
     """
     Read a graph from a file
-    :param graphclass: The class of the graph
+    :param graphclass: The class of the graph, either (a subclass of) `Graph` or `CompactGraph`
     :param f: The file
     :return: The graph
     """
@@ -45,7 +180,6 @@ def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
         try:
             line = read_line(f)
             n = int(line)
-            graph = graphclass(directed=False, n=n)
             break
         except ValueError:
             if len(line) > 0 and line[-1] == '\n':
@@ -54,24 +188,26 @@ def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
                 options.append(line)
 
     line = read_line(f)
-    edges = []
+    tails = []
+    heads = []
+    weights = []
 
     try:
         while True:
             comma = line.find(',')
             if ':' in line:
                 colon = line.find(':')
-                edges.append((int(line[:comma]), int(line[comma + 1:colon]), int(line[colon + 1:])))
+                tail, head, weight = int(line[:comma]), int(line[comma + 1:colon]), int(line[colon + 1:])
             else:
-                edges.append((int(line[:comma]), int(line[comma + 1:]), None))
+                tail, head, weight = int(line[:comma]), int(line[comma + 1:]), None
+            tails.append(tail)
+            heads.append(head)
+            weights.append(weight)
             line = read_line(f)
     except Exception:
         pass
 
-    indexed_nodes = list(graph.vertices)
-
-    for edge in edges:
-        graph += Edge(indexed_nodes[edge[0]], indexed_nodes[edge[1]], edge[2])
+    graph = build_graph(graphclass, n, tails, heads, weights)
 
     if line != '' and line[0] == '-':
         return graph, options, True
@@ -79,49 +215,584 @@ def read_graph(graphclass, f: IO[str]) -> Tuple[Graph, List[str], bool]:
         return graph, options, False
 
 
-def read_graph_list(graph_class, f: IO[str]) -> Tuple[List[Graph], List[str]]:
+def build_graph(graph_class, n: int, tails: List[int], heads: List[int], weights: Optional[List[int]] = None) \
+        -> Union[Graph, CompactGraph]:
+    """
+    Create a graph from its parsed edge arrays
+    :param graph_class: The class of the graph, either (a subclass of) `Graph` or `CompactGraph`
+    :param n: The number of vertices
+    :param tails: For every edge, the index of its tail
+    :param heads: For every edge, the index of its head
+    :param weights: Optional, for every edge its weight
+    :return: The graph
+    """
+    if issubclass(graph_class, CompactGraph):
+        return graph_class(n, tails, heads, weights)
+
+    graph = graph_class(directed=False, n=n)
+    graph.add_edges_from(tails, heads, weights)
+    return graph
+
+
+def parse_edges(text: str) -> Tuple[List[int], List[int], Optional[List[int]], int]:
+    """
+    Parse the edge list at the start of a text in bulk, instead of line by line.
+    :param text: The text, which consists of lines `u,v` or `u,v:w`, optionally followed by other lines
+    :return: The tails, the heads and the weights (None if no edge has a weight) of the edges, and the position in the
+    text right after the edge lines
+    """
+    # Usually the text is nothing but unweighted edges. Then only a comma and a newline per line remain once the
+    # digits and spaces are removed (and the `\r` of `\r\n` line endings), which is a lot cheaper to check than
+    # matching every line. Then every line is just two numbers, so the whole list can be split at once, unless a field
+    # is empty or has a space inside a number.
+    try:
+        skeleton = text.encode('ascii').translate(None, b'0123456789 \t\r')
+    except UnicodeEncodeError:
+        skeleton = None
+
+    if skeleton == b',\n' * text.count('\n') and text.count('\r') == text.count('\r\n'):
+        end = len(text)
+        values_text = text.replace('\r', '')[:-1].replace('\n', ',')
+        if (',,' in values_text or values_text.startswith(',') or values_text.endswith(',') or
+                (' ' in values_text or '\t' in values_text) and _BAD_FIELD.search(values_text) is not None):
+            end = _EDGE_LINES.match(text).end()
+            values_text = None
+    else:
+        end = _EDGE_LINES.match(text).end()
+        values_text = None
+
+    if end == 0:
+        return [], [], None, end
+
+    edge_text = text[:end]
+    if ':' in edge_text:
+        edges = _EDGE.findall(edge_text)
+        return ([int(edge[0]) for edge in edges], [int(edge[1]) for edge in edges],
+                [int(edge[2]) if edge[2] else None for edge in edges], end)
+
+    if values_text is None:
+        values_text = edge_text.replace('\r', '')[:-1].replace('\n', ',')
+    if numpy is not None:
+        values = numpy.fromstring(values_text, dtype=numpy.int64, sep=',').tolist()
+    else:
+        values = list(map(int, values_text.split(',')))
+
+    return values[0::2], values[1::2], None, end
+
+
+def parse_graph(text: str) -> Tuple[int, List[int], List[int], Optional[List[int]], List[str], bool]:
+    """
+    Parse one graph from its text: the option lines, the number of vertices and the edge list.
+    :param text: The text of the graph, without comments and without the separator line
+    :return: The number of vertices, the tails, heads and weights of the edges, the options, and whether the edge list
+    ran up to the end of the text. (The line-by-line parser stops reading a list at the first line that is neither an
+    edge nor a separator, so a list ends after a graph for which this is False.)
+    """
+    options = []
+    start = 0
+
+    while True:
+        end = text.find('\n', start)
+        line = text[start:] if end < 0 else text[start:end]
+        try:
+            n = int(line)
+            break
+        except ValueError:
+            if end < 0:
+                raise GraphError('A graph in the list does not start with its number of vertices')
+            options.append(line[:-1] if line.endswith('\r') else line)
+            start = end + 1
+
+    body = '' if end < 0 else text[end + 1:]
+    if body[-1:] not in ('', '\n'):
+        body += '\n'
+
+    tails, heads, weights, edges_end = parse_edges(body)
+    return n, tails, heads, weights, options, edges_end == len(body)
+
+
+def strip_comments(text: str) -> str:
+    """
+    Remove the comment lines from a text that starts at the start of a line.
+    :param text: The text
+    :return: The text without the lines that start with `#`
+    """
+    if text.startswith('#'):
+        newline = -1
+    else:
+        newline = text.find('\n#')
+        if newline < 0:
+            return text
+
+    pieces = [text[:newline + 1]]
+    while True:
+        # `newline` is the position of the newline before a comment line, or -1 for the first line
+        end = text.find('\n', newline + 1)
+        if end < 0:
+            return ''.join(pieces)
+        start = end + 1
+        newline = text.find('\n#', end)
+        if newline < 0:
+            pieces.append(text[start:])
+            return ''.join(pieces)
+        pieces.append(text[start:newline + 1])
+
+
+def iter_graph_texts(f: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read a graph list in chunks, and split it at the `---` separator lines.
+    :param f: The file
+    :param chunk_size: The number of characters to read at once
+    :return: An iterator over the text of every graph, without comment and separator lines
+    """
+    pieces = []
+    rest = ''
+
+    while True:
+        # Only handle complete lines, the last (incomplete) line is kept for the next chunk
+        chunk = f.read(chunk_size)
+        if len(chunk) > 0:
+            text = rest + chunk
+            cut = text.rfind('\n') + 1
+            text, rest = text[:cut], text[cut:]
+        else:
+            text, rest = rest, ''
+
+        text = strip_comments(text)
+
+        # Every chunk starts at the start of a line, so a separator is either at the start or right after a newline
+        start = 0
+        while True:
+            if text.startswith('-', start):
+                separator = start
+            else:
+                separator = text.find('\n-', start)
+                if separator < 0:
+                    break
+                separator += 1
+
+            pieces.append(text[start:separator])
+            yield ''.join(pieces)
+            pieces = []
+
+            end = text.find('\n', separator)
+            start = len(text) if end < 0 else end + 1
+
+        pieces.append(text[start:])
+        if len(chunk) == 0:
+            break
+
+    yield ''.join(pieces)
+
+
+def iter_graph_list(graph_class, f: IO[str], chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Graph, List[str]]]:
+    """
+    Read the graphs from a file one at a time. The file is read in chunks, and the next graph is only read from the
+    file when it is asked for, so the file must stay open until the iterator is exhausted.
+    :param graph_class: The graph class
+    :param f: The file
+    :param chunk_size: The (approximate) number of characters to read at once
+    :return: An iterator over the graphs, each together with the options that were read in front of it
+    """
+    for text in iter_graph_texts(f, chunk_size):
+        n, tails, heads, weights, options, complete = parse_graph(text)
+        yield build_graph(graph_class, n, tails, heads, weights), options
+
+        if not complete:
+            return
+
+
+def parse_graph_text(graph_class, text: str) -> Tuple[Union[CompactGraph, tuple], List[str], bool]:
+    """
+    Parse the text of one graph in a worker process of `read_graph_list`. Compact graphs are built in the worker as
+    well. For other graph classes only the edge arrays are sent back, since the vertex and edge objects are a lot more
+    expensive to send than to create.
+    :param graph_class: The graph class
+    :param text: The text of the graph, see `iter_graph_texts`
+    :return: The graph, or the arguments of `build_graph` after the graph class, the options, and whether the edge list
+    ran up to the end of the text
+    """
+    n, tails, heads, weights, options, complete = parse_graph(text)
+
+    if issubclass(graph_class, CompactGraph):
+        return build_graph(graph_class, n, tails, heads, weights), options, complete
+    return (n, array('i', tails), array('i', heads), weights), options, complete
+
+
+def read_graph_list(graph_class, f: IO[str], processes: Optional[int] = None) -> Tuple[List[Graph], List[str]]:
     """
     Read a list of graphs from a file
     :param graph_class: The graph class
     :param f: The file
+    :param processes: Optional, parse the graphs in a pool of this many processes (0 for one per CPU). The file is first
+    split at its separator lines, then the graphs are parsed in parallel and put back in order. This pays off for lists
+    of large graphs; the pool itself takes some tens of milliseconds to start.
     :return: A list of graphs
     """
     options = []
     graphs = []
-    cont = True
 
-    while cont:
-        graph, new_options, cont = read_graph(graph_class, f)
-        options += new_options
-        graphs.append(graph)
+    if processes is None:
+        for graph, new_options in iter_graph_list(graph_class, f):
+            options += new_options
+            graphs.append(graph)
+
+        return graphs, options
+
+    texts = list(iter_graph_texts(f))
+    processes = processes or os.cpu_count() or 1
+    with ProcessPoolExecutor(processes) as pool:
+        chunk_size = max(1, len(texts) // (4 * processes))
+        for graph, new_options, complete in pool.map(partial(parse_graph_text, graph_class), texts,
+                                                      chunksize=chunk_size):
+            if not issubclass(graph_class, CompactGraph):
+                graph = build_graph(graph_class, *graph)
+            options += new_options
+            graphs.append(graph)
+
+            # Like `iter_graph_list`, stop after a graph that is followed by something else than a separator
+            if not complete:
+                break
 
     return graphs, options
 
 
-def load_graph(f: IO[str], graph_class=Graph, read_list: bool = False) -> Union[Tuple[List[Graph], List[str]], Graph]:
+def _graph6_size(data: bytes) -> Tuple[int, int]:
     """
-    Load a graph from a file
+    For internal use only; decodes the number of vertices at the start of a graph6 or sparse6 string.
+    :param data: The string, as 6-bit values
+    :return: The number of vertices, and the number of values that encode it
+    """
+    if len(data) > 0 and data[0] != 63:
+        return data[0], 1
+    if len(data) >= 4 and data[1] != 63:
+        return data[1] << 12 | data[2] << 6 | data[3], 4
+    if len(data) >= 8:
+        return int(''.join(_SIX_BITS[value] for value in data[2:8]), 2), 8
+    raise GraphError('The graph6 string is too short')
+
+
+def parse_graph6(line: str) -> Tuple[int, List[int], List[int]]:
+    """
+    Parse a graph in graph6 or sparse6 format (which starts with a `:`). See
+    https://users.cecs.anu.edu.au/~bdm/data/formats.txt for both formats.
+    :param line: The graph6 or sparse6 string, optionally with a header and a trailing newline
+    :return: The number of vertices, and the tails and heads of the edges
+    """
+    line = line.rstrip('\r\n')
+    for header in _GRAPH6_HEADERS:
+        if line.startswith(header):
+            line = line[len(header):]
+
+    sparse = line.startswith(':')
+    try:
+        data = line[1 if sparse else 0:].encode('ascii')
+    except UnicodeEncodeError:
+        data = None
+    if data is None or len(data.translate(None, _GRAPH6_CHARACTERS)) > 0:
+        raise GraphError('{!r} is not a graph6 or sparse6 string'.format(line[:40]))
+
+    # Subtract 63 from every character
+    data = data.translate(_SUBTRACT_63)
+    n, start = _graph6_size(data)
+    bits = ''.join([_SIX_BITS[value] for value in data[start:]])
+    tails = []
+    heads = []
+
+    if not sparse:
+        # The upper triangle of the adjacency matrix, column by column
+        if len(bits) < n * (n - 1) // 2:
+            raise GraphError('The graph6 string is too short for {} vertices'.format(n))
+        column = 0
+        for j in range(1, n):
+            end = column + j
+            i = bits.find('1', column, end)
+            while i >= 0:
+                tails.append(i - column)
+                heads.append(j)
+                i = bits.find('1', i + 1, end)
+            column = end
+        return n, tails, heads
+
+    # Every edge is a bit that says whether to go to the next vertex and a k-bit vertex number
+    k = max(1, (n - 1).bit_length())
+    v = 0
+    for position in range(0, len(bits) - k, k + 1):
+        if bits[position] == '1':
+            v += 1
+        x = int(bits[position + 1:position + k + 1], 2)
+        if x >= n or v >= n:
+            # Padding
+            break
+        if x > v:
+            v = x
+        else:
+            tails.append(x)
+            heads.append(v)
+
+    return n, tails, heads
+
+
+def format_graph6(graph: Union[Graph, CompactGraph], sparse: bool = False) -> str:
+    """
+    Encode a graph in graph6 format, or in sparse6 format, which also allows loops and multi-edges.
+    :param graph: The graph, which should be undirected and have no edge weights
+    :param sparse: Whether to use sparse6 instead of graph6
+    :return: The string, without newline
+    """
+    n = len(graph)
+    edges = edge_list(graph)
+    if graph.directed or any(weight is not None for _, _, weight in edges):
+        raise GraphError('graph6 and sparse6 can only store undirected graphs without edge weights')
+
+    if n < 63:
+        size = [n]
+    elif n < 1 << 18:
+        size = [63, n >> 12, (n >> 6) & 63, n & 63]
+    elif n < 1 << 36:
+        size = [63, 63] + [(n >> shift) & 63 for shift in range(30, -1, -6)]
+    else:
+        raise GraphError('graph6 and sparse6 can store graphs with at most 2^36 - 1 vertices')
+
+    if not sparse:
+        pairs = set((min(tail, head), max(tail, head)) for tail, head, _ in edges)
+        if len(pairs) < len(edges) or any(i == j for i, j in pairs):
+            raise GraphError('graph6 cannot store loops or multi-edges, use sparse6 instead')
+
+        values = bytearray(size) + bytearray((n * (n - 1) // 2 + 5) // 6)
+        for i, j in pairs:
+            position = j * (j - 1) // 2 + i
+            values[len(size) + position // 6] |= 32 >> (position % 6)
+        return values.translate(_ADD_63).decode('ascii')
+
+    k = max(1, (n - 1).bit_length())
+    vertex_bits = '{:0' + str(k) + 'b}'
+    bits = []
+    v = 0
+    for j, i in sorted((max(tail, head), min(tail, head)) for tail, head, _ in edges):
+        if j == v:
+            bits.append('0' + vertex_bits.format(i))
+        elif j == v + 1:
+            v = j
+            bits.append('1' + vertex_bits.format(i))
+        else:
+            v = j
+            bits.append('1' + vertex_bits.format(j) + '0' + vertex_bits.format(i))
+
+    bits = ''.join(bits)
+    padding = -len(bits) % 6
+    # Padding with ones could be read as an edge to vertex n - 1 if n is a power of two and k < 6
+    if k < 6 and n == 1 << k and padding >= k and v < n - 1:
+        bits += '0'
+        padding -= 1
+    bits += '1' * padding
+
+    values = bytes(size) + bytes(int(bits[start:start + 6], 2) for start in range(0, len(bits), 6))
+    return ':' + values.translate(_ADD_63).decode('ascii')
+
+
+def iter_graph6(graph_class, f: IO[str]) -> Iterator[Union[Graph, CompactGraph]]:
+    """
+    Read graphs in graph6 or sparse6 format, one per line, one at a time. Empty lines are skipped.
+    :param graph_class: The graph class
+    :param f: The file, which may be compressed, see `text_stream`
+    :return: An iterator over the graphs
+    """
+    for line in text_stream(f):
+        if line.strip():
+            n, tails, heads = parse_graph6(line)
+            yield build_graph(graph_class, n, tails, heads)
+
+
+def write_graph6_list(graph_list: List[Union[Graph, CompactGraph]], f: IO[str], sparse: bool = False):
+    """
+    Write a graph list in graph6 or sparse6 format, one graph per line.
+    :param graph_list: The list of graphs
     :param f: The file
+    :param sparse: Whether to use sparse6 instead of graph6
+    """
+    for g in graph_list:
+        f.write(format_graph6(g, sparse) + '\n')
+
+
+def cache_path(cache_dir: str, data: bytes) -> str:
+    """
+    The path of the cache entry of a file. The entry is named after the hash and the size of the content of the file
+    and the version of the binary format, so an entry is never used for a file that has changed since.
+    :param cache_dir: The cache directory
+    :param data: The content of the file, that is, the decoded text encoded as UTF-8 (see `read_cached_graph_list`)
+    :return: The path of the entry in the cache directory
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return os.path.join(cache_dir, '{}-{}-v{}.grlb'.format(digest, len(data), BINARY_VERSION))
+
+
+def evict_cache(cache_dir: str, cache_size: int = CACHE_SIZE):
+    """
+    Remove the least recently used entries from a cache directory until it is at most `cache_size` bytes. Temporary
+    files older than `STALE_TEMPORARY_AGE` are removed as well: they belong to entries that were never finished.
+    :param cache_dir: The cache directory
+    :param cache_size: The maximum size of the directory in bytes
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.tmp'):
+            path = os.path.join(cache_dir, name)
+            try:
+                if time.time() - os.stat(path).st_mtime > STALE_TEMPORARY_AGE:
+                    os.remove(path)
+            except OSError:
+                # Already finished or removed by another process
+                pass
+        elif name.endswith('.grlb'):
+            path = os.path.join(cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= cache_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Already removed by another process, or still mapped on a platform that does not allow removing it
+            continue
+        total -= size
+
+
+def read_cached_graph_list(graph_class, f: IO[str], cache_dir: str, cache_size: int = CACHE_SIZE,
+                           processes: Optional[int] = None) -> Tuple[List[Union[Graph, CompactGraph]], List[str]]:
+    """
+    Read a list of graphs from a file, using a cache directory with parsed graph lists in the binary format (see
+    `MappedGraphList`). If the cache has an entry for the content of the file, the graphs are read from it instead of
+    parsing the file. Otherwise the file is parsed and an entry is added, after which the least recently used entries
+    are removed if the directory grew beyond `cache_size` bytes. Entries of files that changed are never used again,
+    so they are removed in time as well.
+
+    The cache is keyed on the decoded text rather than on the bytes of the file: the file is a text stream, which may
+    be decompressed (see `text_stream`) or not come from a file at all, and may have its line endings translated. So a
+    compressed and a plain copy of a file, or copies that only differ in line endings, share the same entry, which is
+    right because they give the same graphs.
+    :param graph_class: The graph class. Compact graphs from the cache use the arrays in the mapped entry.
+    :param f: The file
+    :param cache_dir: The cache directory, which is created if it does not exist
+    :param cache_size: The maximum size of the cache directory in bytes
+    :param processes: Optional, parse the file in a pool of this many processes, see `read_graph_list`
+    :return: A list of graphs, and the options
+    """
+    text = f.read()
+    path = cache_path(cache_dir, text.encode('utf-8'))
+
+    try:
+        cached = MappedGraphList(path, graph_class if issubclass(graph_class, CompactGraph) else CompactGraph)
+    except FileNotFoundError:
+        cached = None
+    except (GraphError, ValueError, struct.error):
+        # A damaged entry, for instance of a process that was killed while writing it
+        try:
+            os.remove(path)
+        except OSError:
+            # Already removed by another process
+            pass
+        cached = None
+
+    if cached is not None:
+        # Mark the entry as recently used. Another process may just have evicted it, but it is still mapped.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with cached:
+            if issubclass(graph_class, CompactGraph):
+                return list(cached), cached.options
+            return [graph.to_graph(graph_class) for graph in cached], cached.options
+
+    graph_list, options = read_graph_list(graph_class, io.StringIO(text), processes)
+
+    # The cache is only an optimisation, so failing to write an entry does not fail reading the graphs. The entry is
+    # written to a temporary file first, so other processes never map an entry that is not complete.
+    temporary = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as entry:
+            temporary = entry.name
+            write_binary_graph_list(graph_list, entry, options)
+        os.replace(temporary, path)
+        temporary = None
+        evict_cache(cache_dir, cache_size)
+    except OSError:
+        pass
+    finally:
+        if temporary is not None:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+    return graph_list, options
+
+
+def load_graph(f: IO, graph_class=Graph, read_list: bool = False, lazy: bool = False,
+               cache_dir: Optional[str] = None, processes: Optional[int] = None) \
+        -> Union[Tuple[List[Graph], List[str]], Iterator[Tuple[Graph, List[str]]], Graph]:
+    """
+    Load a graph from a file
+    :param f: The file, which may be compressed, see `text_stream`
     :param graph_class: The class of the graph. You may subclass the default graph class and add your own here.
     :param read_list: Specifies whether to read a list of graphs from the file, or just a single graph.
+    :param lazy: Only used when reading a list: instead of the list, return an iterator that reads the graphs one at a
+    time, see `iter_graph_list`.
+    :param cache_dir: Optional, a directory with parsed graphs, see `read_cached_graph_list`. The whole file is read
+    to look it up in the cache, so a lazy list does not use the cache: it keeps reading one graph at a time.
+    :param processes: Optional, only used when reading a list that is not lazy: parse the graphs in a pool of this many
+    processes, see `read_graph_list`.
     :return: The graph, or a list of graphs.
     """
+    f = text_stream(f)
+
+    if read_list and lazy:
+        return iter_graph_list(graph_class, f)
+
+    if cache_dir is not None:
+        graph_list, options = read_cached_graph_list(graph_class, f, cache_dir, processes=processes)
+        if not read_list:
+            return graph_list[0]
+        return graph_list, options
+
     if read_list:
-        graph_list, options = read_graph_list(graph_class, f)
+        graph_list, options = read_graph_list(graph_class, f, processes)
         return graph_list, options
     else:
-        graph, options, tmp = read_graph(graph_class, f)
+        graph, options = next(iter_graph_list(graph_class, f))
         return graph  # ,options
 
 
-def input_graph(graph_class=Graph, read_list: bool = False) -> Union[Tuple[List[Graph], List[str]], Graph]:
+def input_graph(graph_class=Graph, read_list: bool = False, lazy: bool = False) \
+        -> Union[Tuple[List[Graph], List[str]], Iterator[Tuple[Graph, List[str]]], Graph]:
     """
-    Load a graph from sys.stdin
+    Load a graph from sys.stdin, which may be compressed
     :param graph_class: The class of the graph. You may subclass the default graph class and add your own here.
     :param read_list: Specifies whether to read a list of graphs from the file, or just a single graph.
+    :param lazy: Only used when reading a list: return an iterator that reads the graphs one at a time.
     :return: The graph, or a list of graphs.
     """
-    return load_graph(f=sys.stdin, graph_class=graph_class, read_list=read_list)
+    return load_graph(f=sys.stdin, graph_class=graph_class, read_list=read_list, lazy=lazy)
+
+
+def edge_list(graph: Union[Graph, CompactGraph]) -> List[Tuple[int, int, object]]:
+    """
+    The edges of a graph as (tail, head, weight) triples, where the vertices are numbered 0..n-1 in graph order.
+    :param graph: The graph, either a `Graph` or a `CompactGraph`
+    :return: The list of edges
+    """
+    if isinstance(graph, CompactGraph):
+        return graph.edges
+
+    return [(e.tail.id, e.head.id, e.weight) for e in graph.edges]
 
 
 def write_line(f: IO[str], line: str):
@@ -133,43 +804,40 @@ def write_line(f: IO[str], line: str):
     f.write(line + '\n')
 
 
-def write_graph_list(graph_list: List[Graph], f: IO[str], options=[]):
+def write_graph_list(graph_list: List[Union[Graph, CompactGraph]], f: IO[str], options=[]):
     """
     Write a graph list to a file.
     :param graph_list: The list of graphs
     :param f: the file
     :param options: the (optional) options to write to the file.
     """
+    lines = []
+
     # we may only write options that cannot be seen as an integer:
     for S in options:
         try:
             int(S)
         except ValueError:
-            write_line(f, str(S))
+            lines.append(str(S) + '\n')
 
     for i, g in enumerate(graph_list):
-        n = len(g)
-        write_line(f, '# Number of vertices:')
-        write_line(f, str(n))
-
-        # Give the vertices (temporary) labels from 0 to n-1:
-        label = {}
-        for vertex_index, vertex in enumerate(g):
-            label[vertex] = vertex_index
+        lines.append('# Number of vertices:\n{}\n# Edge list:\n'.format(len(g)))
 
-        write_line(f, '# Edge list:')
-
-        for e in g.edges:
-            if e.weight:
-                write_line(f, str(label[e.tail]) + ',' + str(label[e.head]) + ':' + str(e.weight))
-            else:
-                write_line(f, str(label[e.tail]) + ',' + str(label[e.head]))
+        # The vertices get (temporary) labels from 0 to n-1:
+        edges = edge_list(g)
+        for start in range(0, len(edges), WRITE_BUFFER_LINES):
+            lines += [f'{tail},{head}:{weight}\n' if weight else f'{tail},{head}\n'
+                      for tail, head, weight in edges[start:start + WRITE_BUFFER_LINES]]
+            f.write(''.join(lines))
+            lines = []
 
         if i + 1 < len(graph_list):
-            write_line(f, '--- Next graph:')
+            lines.append('--- Next graph:\n')
 
+    f.write(''.join(lines))
 
-def save_graph(graph_list: Union[Graph, List[Graph]], f: IO[str], options=[]):
+
+def save_graph(graph_list: Union[Graph, CompactGraph, List[Union[Graph, CompactGraph]]], f: IO[str], options=[]):
     """
     Write a graph, or a list of graphs to a file.
     :param graph_list: The graph, or a list of graphs.
@@ -182,7 +850,7 @@ def save_graph(graph_list: Union[Graph, List[Graph]], f: IO[str], options=[]):
         write_graph_list([graph_list], f, options)
 
 
-def print_graph(graph_list: Union[Graph, List[Graph]], options=[]):
+def print_graph(graph_list: Union[Graph, CompactGraph, List[Union[Graph, CompactGraph]]], options=[]):
     """
     Print a graph, or a list of graphs to sys.stdout
     :param graph_list: The graph, or list of graphs.
@@ -194,55 +862,264 @@ def print_graph(graph_list: Union[Graph, List[Graph]], options=[]):
         write_graph_list([graph_list], sys.stdout, options)
 
 
-def write_dot(graph: Graph, f: IO[str], directed=False):
+def write_binary_graph_list(graph_list: List[Union[Graph, CompactGraph]], f: IO[bytes], options=[]):
+    """
+    Write a graph list to a binary file, which can be memory-mapped by `MappedGraphList`. The file consists of a header,
+    a table with an entry per graph, the options and then for every graph its edge list and its offset, neighbour and
+    degree arrays (see `CompactGraph`), each aligned to 8 bytes. Vertices are numbered 0..n-1, so like in the text
+    format, vertex labels are not stored.
+    :param graph_list: The list of graphs
+    :param f: The file, opened in binary mode
+    :param options: the (optional) options to write to the file.
+    """
+    graphs = [g if isinstance(g, CompactGraph) else CompactGraph.from_graph(g) for g in graph_list]
+    options_data = '\n'.join(str(option) for option in options).encode('utf-8')
+
+    blocks = [options_data]
+    position = _BINARY_HEADER.size + _BINARY_ENTRY.size * len(graphs)
+    positions = [position]
+    entries = []
+
+    for g in graphs:
+        arrays = [array('i', g.tails), array('i', g.heads), array('i', g.offsets), array('i', g.targets),
+                  array('i', g.degrees)]
+        if g.weights is not None:
+            try:
+                arrays.append(array('q', (0 if weight is None else weight for weight in g.weights)))
+            except TypeError:
+                raise GraphError('The binary format only supports integer edge weights')
+            arrays.append(array('B', (weight is not None for weight in g.weights)))
+
+        array_positions = []
+        for values in arrays:
+            if sys.byteorder == 'big':
+                values.byteswap()
+            position += len(blocks[-1])
+            position += -position % 8
+            blocks.append(values.tobytes())
+            positions.append(position)
+            array_positions.append(position)
+
+        array_positions += [0] * (7 - len(array_positions))
+        entries.append(_BINARY_ENTRY.pack(len(g), len(g.tails), len(g.targets), g.directed, g.simple,
+                                          *array_positions))
+
+    f.write(_BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(graphs), positions[0], len(options_data)))
+    for entry in entries:
+        f.write(entry)
+
+    written = positions[0]
+    for block, position in zip(blocks, positions):
+        f.write(bytes(position - written))
+        f.write(block)
+        written = position + len(block)
+
+
+def convert_graph_list(source: str, target: str):
+    """
+    Convert a graph (.gr) or graph list (.grl) file to the binary format of `write_binary_graph_list`.
+    :param source: The path of the text file
+    :param target: The path of the binary file
+    """
+    with open(source) as f:
+        graphs, options = read_graph_list(CompactGraph, f)
+
+    with open(target, 'wb') as f:
+        write_binary_graph_list(graphs, f, options)
+
+
+class MappedGraphList(object):
+    """
+    A graph list in the binary format of `write_binary_graph_list`. The file is memory-mapped: opening it only decodes
+    the header, and the `CompactGraph`s it hands out use the arrays in the file without copying them (only the weights
+    of weighted graphs are copied). Processes that map the same file share its pages.
+    The graphs keep the file mapped, so it is only unmapped after both `close` has been called and the graphs are gone.
+    """
+
+    def __init__(self, path: str, graph_class=CompactGraph):
+        """
+        Opens a binary graph list.
+        :param path: The path of the file
+        :param graph_class: The class of the graphs, `CompactGraph` or a subclass of it
+        """
+        self._graph_class = graph_class
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _BINARY_HEADER.size:
+                raise GraphError('{} is not a binary graph list'.format(path))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, options_position, options_length = _BINARY_HEADER.unpack_from(self._map)
+        if magic != BINARY_MAGIC:
+            self._map.close()
+            raise GraphError('{} is not a binary graph list'.format(path))
+        if version != BINARY_VERSION:
+            self._map.close()
+            raise GraphError('{} has version {} of the binary format, expected {}'.format(path, version,
+                                                                                          BINARY_VERSION))
+
+        if _BINARY_HEADER.size + count * _BINARY_ENTRY.size > len(self._map):
+            self._map.close()
+            raise GraphError('{} is truncated'.format(path))
+
+        self._entries = [_BINARY_ENTRY.unpack_from(self._map, _BINARY_HEADER.size + i * _BINARY_ENTRY.size)
+                         for i in range(count)]
+
+        # The file ends with the options, or with the arrays of the last graph
+        end = options_position + options_length
+        if len(self._entries) > 0:
+            n, m, length, _, _, _, _, _, _, degrees, weights, mask = self._entries[-1]
+            end = mask + m if weights != 0 else degrees + 4 * n
+        if end > len(self._map):
+            self._map.close()
+            raise GraphError('{} is truncated'.format(path))
+
+        options = self._map[options_position:options_position + options_length].decode('utf-8')
+        self._options = options.split('\n') if options_length > 0 else []
+        self._buffer = memoryview(self._map)
+
+    def _array(self, position: int, length: int, typecode: str):
+        """
+        For internal use only; returns an array in the file, as a view on little-endian machines.
+        :param position: The position of the array in the file
+        :param length: The number of items
+        :param typecode: The type of the items, as in the `array` module
+        :return: The array
+        """
+        data = self._buffer[position:position + length * array(typecode).itemsize]
+        if sys.byteorder == 'little':
+            return data.cast(typecode)
+
+        values = array(typecode, data.tobytes())
+        values.byteswap()
+        return values
+
+    def __len__(self) -> int:
+        """
+        :return: The number of graphs in the list
+        """
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> CompactGraph:
+        """
+        Returns a graph from the list.
+        :param index: The index of the graph
+        :return: The graph
+        """
+        n, m, length, directed, simple, tails, heads, offsets, targets, degrees, weights, mask = self._entries[index]
+
+        weight_list = None
+        if weights != 0:
+            weight_list = [weight if has_weight else None
+                           for weight, has_weight in zip(self._array(weights, m, 'q'), self._array(mask, m, 'B'))]
+
+        return self._graph_class.from_arrays(n, self._array(tails, m, 'i'), self._array(heads, m, 'i'),
+                                             self._array(offsets, n + 1, 'i'), self._array(targets, length, 'i'),
+                                             self._array(degrees, n, 'i'), weight_list,
+                                             directed=bool(directed), simple=bool(simple))
+
+    def __iter__(self) -> Iterator[CompactGraph]:
+        """
+        :return: An iterator over the graphs in the list
+        """
+        return (self[index] for index in range(len(self._entries)))
+
+    @property
+    def options(self) -> List[str]:
+        """
+        :return: The options of the graph list
+        """
+        return self._options
+
+    def close(self):
+        """
+        Close the file. Graphs that were handed out before remain usable.
+        """
+        self._buffer.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Graphs from the file still use the mapping, it is closed when they are garbage collected
+            pass
+
+    def __enter__(self) -> "MappedGraphList":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def dot_color(colornum: int, fill: bool) -> str:
+    """
+    The .dot attributes for a color number.
+    :param colornum: The color number
+    :param fill: Whether colors beyond the color scheme are shown with a fill color (only for vertices)
+    :return: The attributes, each followed by a comma
+    """
+    options = 'color=' + str(colornum % NUM_COLORS + 1) + ', colorscheme=' + DEFAULT_COLOR_SCHEME + ','
+    if fill and colornum >= NUM_COLORS:
+        options += 'style=filled,fillcolor=' + str((colornum // NUM_COLORS) % NUM_COLORS + 1) + ','
+    return options
+
+
+def write_dot(graph: Union[Graph, CompactGraph, DisjointUnion], f: IO[str], directed=False):
     """
     Writes a given graph to a file in .dot format.
-    :param graph: The graph. If its vertices contain attributes `label`, `colortext` or `colornum`, these are also
-    included in the file. If its edges contain an attribute `weight`, these are also included in the file.
+    :param graph: The graph. If its vertices have a `label`, `colortext` or `colornum`, these are also
+    included in the file. If its edges have a `weight`, `colortext` or `colornum`, these are also included in the file.
+    A `CompactGraph` is written with its labels and weights, a `DisjointUnion` of `Graph`s is written as one graph.
     :param f: The file.
     :param directed: Whether the graph should be drawn as a directed graph.
     """
-    if directed:
-        f.write('digraph G {\n')
-    else:
-        f.write('graph G {\n')
+    if isinstance(graph, CompactGraph):
+        graph = graph.to_graph()
+
+    lines = ['digraph G {\n' if directed else 'graph G {\n']
+
+    # The color attributes of every color are only formatted once, and so are the attributes of edges with the same
+    # weight and color
+    vertex_colors = {}
+    edge_attributes = {}
 
     name = {}
-    next_name = 0
     for v in graph:
-        name[v] = next_name
-        next_name += 1
+        name[v] = str(len(name))
         options = 'penwidth=3,'
-        if hasattr(v, 'label'):
-            options += 'label="' + str(v.label) + '",'
-        if hasattr(v, 'colortext'):
-            options += 'color="' + v.colortext + '",'
-        elif hasattr(v, 'colornum'):
-            options += 'color=' + str(v.colornum % NUM_COLORS + 1) + ', colorscheme=' + DEFAULT_COLOR_SCHEME + ','
-            if v.colornum >= NUM_COLORS:
-                options += 'style=filled,fillcolor=' + str((v.colornum // NUM_COLORS) % NUM_COLORS + 1) + ','
-        if len(options) > 0:
-            f.write('    ' + str(name[v]) + ' [' + options[:-1] + ']\n')
-        else:
-            f.write('    ' + str(name[v]) + '\n')
-    f.write('\n')
+        if v.label is not None:
+            options += f'label="{v.label}",'
+        if v.colortext is not None:
+            options += f'color="{v.colortext}",'
+        elif v.colornum is not None:
+            color = vertex_colors.get(v.colornum)
+            if color is None:
+                color = vertex_colors[v.colornum] = dot_color(v.colornum, True)
+            options += color
+        lines.append(f'    {name[v]} [{options[:-1]}]\n')
+
+        if len(lines) >= WRITE_BUFFER_LINES:
+            f.write(''.join(lines))
+            lines = []
+    lines.append('\n')
 
+    arrow = ' -> ' if directed else '--'
     for e in graph.edges:
-        options = 'penwidth=2,'
-        if hasattr(e, 'weight'):
-            options += 'label="' + str(e.weight) + '",'
-        if hasattr(e, 'colortext'):
-            options += 'color="' + e.colortext + '",'
-        elif hasattr(e, 'colornum'):
-            options += 'color=' + str(e.colornum % NUM_COLORS + 1) + ', colorscheme=' + DEFAULT_COLOR_SCHEME + ','
-        if len(options) > 0:
-            options = ' [' + options[:-1] + ']'
-        if directed:
-            f.write('    ' + str(name[e.tail]) + ' -> ' + str(name[e.head]) + options + '\n')
-        else:
-            f.write('    ' + str(name[e.tail]) + '--' + str(name[e.head]) + options + '\n')
+        key = (e.weight, e.colortext, e.colornum)
+        attributes = edge_attributes.get(key)
+        if attributes is None:
+            options = f'penwidth=2,label="{e.weight}",'
+            if e.colortext is not None:
+                options += f'color="{e.colortext}",'
+            elif e.colornum is not None:
+                options += dot_color(e.colornum, False)
+            attributes = edge_attributes[key] = f' [{options[:-1]}]\n'
+        lines.append('    ' + name[e.tail] + arrow + name[e.head] + attributes)
+
+        if len(lines) >= WRITE_BUFFER_LINES:
+            f.write(''.join(lines))
+            lines = []
+
+    lines.append('}')
+    f.write(''.join(lines))
 
-    f.write('}')
 
 if __name__ == "__main__":
     from mygraphs import MyGraph
@@ -0,0 +1,272 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tempfile
+import unittest
+
+from color_refinement import compact_color_refinement
+from compact_graph import CompactGraph
+from graph import Graph, GraphError
+from graph_io import load_graph, save_graph, read_graph, iter_graph_list, write_binary_graph_list, \
+    convert_graph_list, MappedGraphList, read_cached_graph_list, cache_path, evict_cache, write_dot, parse_graph6, \
+    format_graph6, iter_graph6, write_graph6_list
+
+
+GRAPH_LIST = """# A comment
+option one
+3
+0,1
+1,2:5
+--- Next graph:
+# Number of vertices:
+2
+0,1
+--- Next graph:
+option two
+1
+"""
+
+
+class GraphIOTest(unittest.TestCase):
+
+    def test_read_list(self):
+        graphs, options = load_graph(io.StringIO(GRAPH_LIST), read_list=True)
+
+        self.assertEqual([3, 2, 1], [len(graph) for graph in graphs])
+        self.assertEqual([2, 1, 0], [len(graph.edges) for graph in graphs])
+        self.assertEqual(5, graphs[0].edges[1].weight)
+        self.assertEqual(['option one', 'option two'], options)
+
+    def test_lazy_read_list(self):
+        f = io.StringIO(GRAPH_LIST)
+        graphs = iter_graph_list(Graph, f, chunk_size=1)
+
+        graph, options = next(graphs)
+        self.assertEqual(3, len(graph))
+        self.assertEqual(['option one'], options)
+        # The later graphs have not been read yet
+        self.assertIn('option two', f.read())
+
+        f.seek(0)
+        self.assertEqual([3, 2, 1], [len(graph) for graph, options in load_graph(f, read_list=True, lazy=True)])
+
+    def test_bulk_parser(self):
+        """
+        The bulk parser gives the same graphs and options as the line by line parser.
+        """
+        for directory in ('graphs/branching/', 'graphs/color refinement/', 'graphs/delivery/'):
+            for file_name in sorted(os.listdir(directory)):
+                with open(directory + file_name) as f:
+                    expected = []
+                    expected_options = []
+                    cont = True
+                    while cont:
+                        graph, options, cont = read_graph(CompactGraph, f)
+                        expected.append(graph)
+                        expected_options += options
+
+                with open(directory + file_name) as f:
+                    graphs, options = load_graph(f, graph_class=CompactGraph, read_list=True)
+
+                self.assertEqual(expected_options, options, file_name)
+                self.assertEqual([(len(g), g.edges) for g in expected], [(len(g), g.edges) for g in graphs], file_name)
+
+    def test_bulk_parser_format(self):
+        text = '# comment\n4\n0,1\n 1 , 2 : -3\n# comment\n2,3:+4\n3,0\n--- Next graph:\n2\n0,1'
+        graphs = [graph for graph, options in iter_graph_list(CompactGraph, io.StringIO(text), chunk_size=3)]
+
+        self.assertEqual([(0, 1, None), (1, 2, -3), (2, 3, 4), (3, 0, None)], graphs[0].edges)
+        self.assertEqual([(0, 1, None)], graphs[1].edges)
+
+        # Like the line by line parser, the list ends at a line that is neither an edge nor a separator
+        text = '2\n0,1\n\n--- Next graph:\n2\n0,1'
+        self.assertEqual(1, len(load_graph(io.StringIO(text), read_list=True)[0]))
+
+        # Also at a line with an empty field or with a space inside a number
+        for text, edges in (('3\n0,\n1,2\n', 0), ('3\n0,1\n1 2,2\n', 1), ('3\n0,1\n1\r2,2\n', 1)):
+            graphs = load_graph(io.StringIO(text, newline=''), graph_class=CompactGraph, read_list=True)[0]
+            self.assertEqual([(3, edges)], [(len(graph), len(graph.edges)) for graph in graphs])
+
+    def test_bulk_parser_crlf(self):
+        with open('graphs/branching/cubes3.grl') as f:
+            text = f.read()
+        expected, expected_options = load_graph(io.StringIO(text), read_list=True)
+
+        f = io.StringIO('option\n' + text.replace('\n', '\r\n'), newline='')
+        graphs, options = load_graph(f, read_list=True)
+        self.assertEqual(['option'] + expected_options, options)
+        self.assertEqual([str(graph) for graph in expected], [str(graph) for graph in graphs])
+
+    def test_parallel_read_list(self):
+        text = GRAPH_LIST + '--- Next graph:\n2\n0,1\n\n--- Next graph:\n2\n0,1\n'
+        expected, expected_options = load_graph(io.StringIO(text), read_list=True)
+
+        for graph_class in (Graph, CompactGraph):
+            graphs, options = load_graph(io.StringIO(text), graph_class=graph_class, read_list=True, processes=2)
+            self.assertEqual(expected_options, options)
+            self.assertEqual([3, 2, 1, 2], [len(graph) for graph in graphs])
+            self.assertEqual([str(graph) for graph in expected],
+                             [str(graph if graph_class is Graph else graph.to_graph()) for graph in graphs])
+
+    def test_binary_graph_list(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trees11.grlb')
+            convert_graph_list('graphs/branching/trees11.grl', path)
+            with open('graphs/branching/trees11.grl') as f:
+                expected, options = load_graph(f, graph_class=CompactGraph, read_list=True)
+
+            with MappedGraphList(path) as graphs:
+                self.assertEqual(len(expected), len(graphs))
+                self.assertEqual(options, graphs.options)
+                for graph, copy in zip(expected, graphs):
+                    self.assertEqual(graph.edges, copy.edges)
+                    self.assertEqual(list(graph.offsets), list(copy.offsets))
+                    self.assertEqual(list(graph.targets), list(copy.targets))
+                    self.assertEqual([graph.degree(v) for v in graph], [copy.degree(v) for v in copy])
+                self.assertEqual(compact_color_refinement(expected), compact_color_refinement(list(graphs)))
+                last = graphs[-1]
+            self.assertEqual(expected[-1].edges, last.edges)
+
+            # Weights, options and ordinary graphs
+            graphs, options = load_graph(io.StringIO(GRAPH_LIST), read_list=True)
+            with open(path, 'wb') as f:
+                write_binary_graph_list(graphs, f, options)
+            with MappedGraphList(path) as copies:
+                self.assertEqual(options, copies.options)
+                self.assertEqual([str(graph) for graph in graphs], [str(copy.to_graph()) for copy in copies])
+                self.assertEqual((1, 2, 5), copies[0].edges[1])
+
+            with open(path, 'w') as f:
+                f.write(GRAPH_LIST)
+            self.assertRaises(GraphError, MappedGraphList, path)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected, expected_options = load_graph(io.StringIO(GRAPH_LIST), read_list=True)
+            for _ in range(2):
+                graphs, options = load_graph(io.StringIO(GRAPH_LIST), read_list=True, cache_dir=cache_dir)
+                self.assertEqual([str(graph) for graph in expected], [str(graph) for graph in graphs])
+                self.assertEqual(expected_options, options)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+
+            # The entry is used instead of parsing the file
+            path = cache_path(cache_dir, GRAPH_LIST.encode('utf-8'))
+            with open(path, 'wb') as f:
+                write_binary_graph_list(expected[:1], f, ['cached'])
+            graphs, options = read_cached_graph_list(CompactGraph, io.StringIO(GRAPH_LIST), cache_dir)
+            self.assertEqual((1, ['cached']), (len(graphs), options))
+            self.assertIsInstance(graphs[0], CompactGraph)
+
+            # A damaged entry is replaced
+            with open(path, 'wb') as f:
+                f.write(b'GRLB')
+            self.assertEqual(3, len(load_graph(io.StringIO(GRAPH_LIST), read_list=True, cache_dir=cache_dir)[0]))
+            with MappedGraphList(path) as graphs:
+                self.assertEqual(3, len(graphs))
+
+            # Changed files get a new entry, and the least recently used entries are evicted
+            changed = GRAPH_LIST.replace('option two', 'option three')
+            self.assertEqual(3, len(load_graph(io.StringIO(changed), cache_dir=cache_dir)))
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+            os.utime(path, (0, 0))
+            read_cached_graph_list(Graph, io.StringIO(changed.replace('three', 'four')), cache_dir, cache_size=1000)
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+            self.assertFalse(os.path.exists(path))
+
+            # Temporary files of entries that were never finished are removed once they are old enough
+            for name in ('stale.tmp', 'written.tmp'):
+                with open(os.path.join(cache_dir, name), 'wb') as f:
+                    f.write(b'GRLB')
+            os.utime(os.path.join(cache_dir, 'stale.tmp'), (0, 0))
+            evict_cache(cache_dir)
+            self.assertEqual(['written.tmp'], [name for name in os.listdir(cache_dir) if name.endswith('.tmp')])
+
+            # A lazy list is read one graph at a time, so it does not use the cache
+            graphs = load_graph(io.StringIO(GRAPH_LIST), read_list=True, lazy=True, cache_dir=cache_dir)
+            self.assertEqual([3, 2, 1], [len(graph) for graph, options in graphs])
+            self.assertFalse(os.path.exists(path))
+
+    def test_compressed(self):
+        with open('graphs/branching/cubes3.grl', 'rb') as f:
+            data = f.read()
+        with open('graphs/branching/cubes3.grl') as f:
+            expected = [str(graph) for graph in load_graph(f, read_list=True)[0]]
+
+        # Also with Windows line endings, which are translated like in text mode
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cubes3.grl.compressed')
+            for content in (data, data.replace(b'\n', b'\r\n')):
+                for module in (gzip, bz2, lzma):
+                    with open(path, 'wb') as f:
+                        f.write(module.compress(content))
+                    for mode in ('r', 'rb'):
+                        with open(path, mode) as f:
+                            self.assertEqual(expected, [str(graph) for graph in load_graph(f, read_list=True)[0]])
+
+        for content in (data, data.replace(b'\n', b'\r\n')):
+            buffer = io.BytesIO(content)
+            self.assertEqual(expected, [str(graph) for graph in load_graph(buffer, read_list=True)[0]])
+            self.assertFalse(buffer.closed)
+
+    def test_graph6(self):
+        # The examples of the format description
+        self.assertEqual((5, [0, 1, 0, 3], [2, 3, 4, 4]), parse_graph6('DQc\n'))
+        self.assertEqual((7, [0, 0, 1, 5], [1, 2, 2, 6]), parse_graph6('>>sparse6<<:Fa@x^\n'))
+        self.assertEqual('DQc', format_graph6(CompactGraph(5, [0, 0, 1, 3], [2, 4, 3, 4])))
+        self.assertEqual(':Fa@x^', format_graph6(CompactGraph(7, [0, 0, 1, 5], [1, 2, 2, 6]), sparse=True))
+
+        # Loops and multi-edges only fit in sparse6, weights in neither
+        graph = CompactGraph(4, [0, 0, 3, 1], [1, 1, 3, 1])
+        self.assertEqual((4, [0, 0, 1, 3], [1, 1, 1, 3]), parse_graph6(format_graph6(graph, sparse=True)))
+        self.assertRaises(GraphError, format_graph6, graph)
+        self.assertRaises(GraphError, format_graph6, CompactGraph(2, [0], [1], [3]), True)
+        self.assertRaises(GraphError, parse_graph6, 'D Q')
+
+        with open('graphs/branching/cubes3.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+        for sparse in (False, True):
+            buffer = io.StringIO()
+            write_graph6_list(graphs, buffer, sparse)
+            buffer.seek(0)
+            copies = list(iter_graph6(Graph, buffer))
+            self.assertEqual([sorted(sorted((e.tail.id, e.head.id)) for e in graph.edges) for graph in graphs],
+                             [sorted(sorted((e.tail.id, e.head.id)) for e in copy.edges) for copy in copies])
+
+    def test_write_dot(self):
+        graph = load_graph(io.StringIO(GRAPH_LIST))
+        u, v, w = graph.vertices
+        u.colornum, v.colornum, w.colortext = 1, 13, 'red'
+        graph.edges[0].colornum = 2
+
+        buffer = io.StringIO()
+        write_dot(graph, buffer)
+        self.assertEqual('graph G {\n'
+                         '    0 [penwidth=3,label="0",color=2, colorscheme=paired12]\n'
+                         '    1 [penwidth=3,label="1",color=2, colorscheme=paired12,style=filled,fillcolor=2]\n'
+                         '    2 [penwidth=3,label="2",color="red"]\n'
+                         '\n'
+                         '    0--1 [penwidth=2,label="None",color=3, colorscheme=paired12]\n'
+                         '    1--2 [penwidth=2,label="5"]\n'
+                         '}', buffer.getvalue())
+
+        # Labels and colors are written as they are, even with a % in them
+        graph.edges[1].colortext = '%s 100%'
+        buffer = io.StringIO()
+        write_dot(graph, buffer)
+        self.assertIn('    1--2 [penwidth=2,label="5",color="%s 100%"]\n', buffer.getvalue())
+
+    def test_write_read(self):
+        graphs, options = load_graph(io.StringIO(GRAPH_LIST), read_list=True)
+        buffer = io.StringIO()
+        save_graph(graphs, buffer, options)
+
+        buffer.seek(0)
+        copies, copy_options = load_graph(buffer, read_list=True)
+        self.assertEqual([str(graph) for graph in graphs], [str(copy) for copy in copies])
+        self.assertEqual(options, copy_options)
+
+
+if __name__ == '__main__':
+    unittest.main()
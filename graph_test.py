@@ -0,0 +1,128 @@
+import unittest
+
+from compact_graph import CompactGraph
+from graph import Graph, GraphError, Vertex, Edge, DisjointUnion
+from graph_io import load_graph
+
+
+class GraphTest(unittest.TestCase):
+
+    def test_add_edge_adds_vertices(self):
+        graph = Graph(False)
+        u, v = Vertex(graph), Vertex(graph)
+        graph += u
+        graph += Edge(u, v)
+        graph += Edge(v, u)
+
+        self.assertEqual([u, v], graph.vertices)
+        self.assertEqual(2, len(graph.edges))
+
+    def test_adjacency_views(self):
+        graph = Graph(False, n=3)
+        u, v, w = graph.vertices
+        graph += Edge(u, v)
+        self.assertEqual((v,), u.neighbours)
+        self.assertIs(u.neighbours, u.neighbours)
+
+        graph += Edge(u, v)
+        graph += Edge(w, u)
+        graph += Edge(u, u)
+        self.assertEqual({v, w, u}, set(u.neighbours))
+        self.assertEqual(4, u.degree)
+        self.assertEqual(4, len(u.incidence))
+        self.assertEqual(2, v.degree)
+
+    def test_vertex_ids(self):
+        graph = Graph(False, n=2)
+        u, v = graph.vertices
+        w = Vertex(graph)
+        self.assertIsNone(w.id)
+
+        graph += Edge(w, u)
+        self.assertEqual([0, 1, 2], [x.id for x in graph])
+        self.assertIs(w, graph.vertex(2))
+        self.assertRaises(GraphError, graph.add_vertex, w)
+        other = Graph(False, n=2)
+        self.assertRaises(GraphError, graph.add_edge, Edge(*other.vertices))
+
+        copy = Graph(False) + graph
+        self.assertEqual(w.label, copy.vertex(w.id).label)
+
+    def test_add_edges_from(self):
+        graph = Graph(False, n=4)
+        graph.add_edges_from([0, 1, 2], [1, 2, 2], [None, 3, None])
+
+        self.assertEqual('V=[0, 1, 2, 3]\nE=[(0, 1), (1, 2), (2, 2)]', str(graph))
+        self.assertEqual(3, graph.edges[1].weight)
+        self.assertEqual(2, graph.vertex(2).degree)
+        self.assertTrue(graph.is_adjacent(graph.vertex(2), graph.vertex(1)))
+        self.assertRaises(GraphError, graph.add_edges_from, [0], [4])
+
+        simple = Graph(False, n=3, simple=True)
+        self.assertRaises(GraphError, simple.add_edges_from, [0, 1], [1, 0])
+        self.assertRaises(GraphError, simple.add_edges_from, [2], [2])
+
+    def test_simple_graph(self):
+        graph = Graph(False, n=2, simple=True)
+        u, v = graph.vertices
+        graph += Edge(u, v)
+
+        self.assertRaises(GraphError, graph.add_edge, Edge(v, u))
+        self.assertRaises(GraphError, graph.add_edge, Edge(u, u))
+
+    def test_adjacency(self):
+        for directed in (False, True):
+            graph = Graph(directed, n=3)
+            u, v, w = graph.vertices
+            edge = Edge(u, v)
+            graph += edge
+
+            self.assertTrue(graph.is_adjacent(u, v))
+            self.assertEqual(not directed, graph.is_adjacent(v, u))
+            self.assertFalse(graph.is_adjacent(u, w))
+            self.assertEqual({edge}, graph.find_edge(v, u))
+            self.assertEqual(set(), graph.find_edge(u, w))
+
+    def test_copy_keeps_fields(self):
+        graph = Graph(False, n=3)
+        u, v, w = graph.vertices
+        graph += Edge(u, v)
+        u.colornum = 4
+        v.pre_labeled = True
+
+        copy = graph + Graph(False)
+        self.assertEqual([4, None, None], [x.colornum for x in copy])
+        self.assertEqual([False, True, False], [x.pre_labeled for x in copy])
+        self.assertFalse(hasattr(copy.vertices[0], '__dict__'))
+        self.assertFalse(hasattr(copy.edges[0], '__dict__'))
+
+    def test_disjoint_union(self):
+        with open('graphs/branching/trees11.grl') as f:
+            graphs = load_graph(f, read_list=True)[0]
+
+        union = DisjointUnion(graphs)
+        self.assertEqual(sum(len(graph) for graph in graphs), len(union))
+        self.assertEqual([v for graph in graphs for v in graph], union.vertices)
+        self.assertEqual(sum(len(graph.edges) for graph in graphs), len(union.edges))
+
+        compact = DisjointUnion([CompactGraph(0, [], []), CompactGraph.from_graph(graphs[0]),
+                                 CompactGraph.from_graph(graphs[1])])
+        start = len(graphs[0])
+        self.assertEqual(list(range(len(compact))), compact.vertices)
+        self.assertEqual((2, 0), compact.locate(start))
+        self.assertEqual(sorted(start + graphs[1].vertices.index(v) for v in graphs[1].vertices[0].neighbours),
+                         sorted(compact.neighbours(start)))
+        self.assertEqual([[], list(range(start)), list(range(start, len(compact)))], compact.split(compact.vertices))
+
+    def test_copy_large_graph(self):
+        with open('graphs/color refinement/threepaths10240.gr') as f:
+            graph = load_graph(f)
+        copy = graph + Graph(False)
+
+        self.assertEqual(len(graph), len(copy))
+        self.assertEqual(len(graph.edges), len(copy.edges))
+        self.assertEqual([v.degree for v in graph], [v.degree for v in copy])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Color refinement on flat (CSR) arrays with NumPy, as a backend for `color_refinement.color_refinement` and
+`fast_color_refinement.fast_color_refinement`.
+
+Every round gives every vertex the same signature as `color_refinement.refine_colors` does: its color and the sorted
+colors of its neighbours. The vertices are grouped by their number of neighbours, so that the signatures of a group
+form a matrix, and the distinct rows of these matrices give the new colors. This is exact, there is no hashing
+involved. Every round takes time linear in the size of the graphs, so the number of rounds decides the time, also as
+the backend of `fast_color_refinement`: a path of n vertices needs about n / 2 rounds, while Hopcroft's refinement in
+`coloring.Coloring` does not refine in rounds. NumPy is optional: without it, this module can be imported but not used.
+"""
+
+from typing import Optional, Union
+
+from graph import Graph, GraphError, DisjointUnion
+from compact_graph import CompactGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def check_numpy():
+    """
+    Raise an ImportError if NumPy is not installed.
+    """
+    if numpy is None:
+        raise ImportError('The numpy color refinement backend needs NumPy')
+
+
+def refine_numpy_colors(offsets: "numpy.ndarray", targets: "numpy.ndarray", colors: "numpy.ndarray") \
+        -> "numpy.ndarray":
+    """
+    Refine the colors of the vertices of a graph in CSR form, see `compact_graph.CompactGraph`.
+    :param offsets: The offset array, of length n + 1
+    :param targets: The flat neighbour array
+    :param colors: The initial colors of the vertices
+    :return: The refined colors, numbered 0..k-1
+    """
+    check_numpy()
+    n = len(colors)
+    if n == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    offsets = numpy.asarray(offsets, dtype=numpy.int64)
+    targets = numpy.asarray(targets, dtype=numpy.int64)
+    lengths = numpy.diff(offsets)
+    sources = numpy.repeat(numpy.arange(n, dtype=numpy.int64), lengths)
+
+    # Only vertices with equally many neighbours can have the same signature. For every number of neighbours, the
+    # positions in the (sorted) neighbour array of the vertices with that many neighbours.
+    groups = list()
+    for length in numpy.unique(lengths):
+        vertices = numpy.flatnonzero(lengths == length)
+        groups.append((vertices, offsets[vertices][:, None] + numpy.arange(length)))
+
+    colors = numpy.unique(numpy.asarray(colors), return_inverse=True)[1].reshape(-1).astype(numpy.int64)
+    number_of_colors = int(colors.max()) + 1
+
+    while True:
+        # Sort the colors of the neighbours of every vertex, the vertices themselves stay in order
+        neighbour_colors = numpy.sort(sources * number_of_colors + colors[targets]) - sources * number_of_colors
+
+        new_colors = numpy.empty_like(colors)
+        next_color = 0
+        for vertices, positions in groups:
+            # Number the distinct signatures one column at a time: the number of a signature prefix together with
+            # the next color fits in a single integer, so that only one-dimensional arrays need to be made unique.
+            signatures = colors[vertices]
+            for column in neighbour_colors[positions].T:
+                signatures = numpy.unique(signatures * number_of_colors + column, return_inverse=True)[1].reshape(-1)
+            if positions.shape[1] == 0:
+                # Vertices without neighbours only have their own color
+                signatures = numpy.unique(signatures, return_inverse=True)[1].reshape(-1)
+
+            new_colors[vertices] = next_color + signatures
+            next_color += int(signatures.max()) + 1
+        colors = new_colors
+
+        # A change has been made if a color got splitted into multiple new colors
+        if next_color == number_of_colors:
+            return colors
+        number_of_colors = next_color
+
+
+def numpy_color_refinement(graphs: Union[list[CompactGraph], DisjointUnion]) -> list[list[int]]:
+    """
+    Does color refinement on compact graphs with NumPy, like `color_refinement.compact_color_refinement`.
+    Every vertex starts with its degree as color.
+    :param graphs: An array with compact graphs, or a disjoint union view of them.
+    :return: For every graph the list of colors of its vertices, indexed by vertex.
+    """
+    check_numpy()
+    union = graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs)
+
+    offsets = [numpy.zeros(1, dtype=numpy.int64)]
+    targets = list()
+    degrees = list()
+    edges = 0
+    for graph, start in zip(union.graphs, union.starts):
+        offsets.append(numpy.asarray(graph.offsets, dtype=numpy.int64)[1:] + edges)
+        targets.append(numpy.asarray(graph.targets, dtype=numpy.int64) + start)
+        degrees.append(numpy.asarray(graph.degrees, dtype=numpy.int64))
+        edges += len(graph.targets)
+
+    colors = refine_numpy_colors(numpy.concatenate(offsets), numpy.concatenate(targets or [[]]),
+                                 numpy.concatenate(degrees or [[]]))
+    return union.split(colors.tolist())
+
+
+def numpy_refine_graphs(graphs: Union[list[Graph], DisjointUnion], colors: Optional[list[int]] = None) -> list[int]:
+    """
+    Refine the colors of the vertices of `Graph`s with NumPy. Without start colors, like `color_refinement.merge_graphs`
+    a vertex without color starts with its degree as color, and the refined colors are stored in `colornum`. With start
+    colors the graphs are not changed.
+    :param graphs: An array with graphs, or a disjoint union view of them.
+    :param colors: Optional, the start colors of the vertices of their union, see `coloring.Coloring`.
+    :return: The refined colors of the vertices of the union, numbered 0..k-1
+    """
+    check_numpy()
+    union = graphs if isinstance(graphs, DisjointUnion) else DisjointUnion(graphs)
+
+    offsets = [0]
+    targets = list()
+    start_colors = list()
+    for graph, start in zip(union.graphs, union.starts):
+        if not isinstance(graph, Graph):
+            raise GraphError('numpy_refine_graphs needs Graphs, use numpy_color_refinement for compact graphs')
+        for vertex in graph:
+            targets.extend(start + u.id for u in vertex.neighbours)
+            offsets.append(len(targets))
+            start_colors.append(vertex.degree if vertex.colornum is None else vertex.colornum)
+
+    refined = refine_numpy_colors(numpy.array(offsets), numpy.array(targets, dtype=numpy.int64),
+                                  numpy.array(start_colors if colors is None else colors, dtype=numpy.int64)).tolist()
+    if colors is None:
+        for vertex, color in zip(union, refined):
+            vertex.colornum = color
+    return refined
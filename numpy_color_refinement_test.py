@@ -0,0 +1,66 @@
+import unittest
+
+from color_refinement import color_refinement, compact_color_refinement
+from coloring import Coloring
+from coloring_test import partition
+from compact_graph import CompactGraph
+from fast_color_refinement import fast_color_refinement
+from graph import Graph
+from graph_io import load_graph
+from numpy_color_refinement import numpy, refine_numpy_colors
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class NumpyColorRefinementTest(unittest.TestCase):
+
+    def load(self, file_name: str):
+        with open(file_name) as f:
+            return load_graph(f, read_list=True)[0]
+
+    def test_same_partition(self):
+        for file_name in ('graphs/color refinement/colorref_smallexample_6_15.grl',
+                          'graphs/color refinement/threepaths40.gr', 'graphs/branching/trees36.grl'):
+            expected = self.load(file_name)
+            color_refinement(expected)
+            expected = partition([v.colornum for graph in expected for v in graph])
+
+            for refine in (color_refinement, fast_color_refinement):
+                graphs = self.load(file_name)
+                refine(graphs, backend='numpy')
+                self.assertEqual(expected, partition([v.colornum for graph in graphs for v in graph]), file_name)
+
+            colors = compact_color_refinement([CompactGraph.from_graph(graph) for graph in self.load(file_name)],
+                                              backend='numpy')
+            self.assertEqual(expected, partition([color for graph in colors for color in graph]), file_name)
+
+    def test_initial_colors(self):
+        # A path on 4 vertices, of which one end is colored differently
+        graph = Graph(False, n=4)
+        u, v, w, x = graph.vertices
+        graph.add_edges_from([0, 1, 2], [1, 2, 3])
+        color_refinement([graph], backend='numpy')
+        self.assertEqual(partition([0, 1, 1, 0]), partition([y.colornum for y in graph]))
+
+        for y in graph:
+            y.colornum = None
+        u.colornum = 7
+        color_refinement([graph], backend='numpy')
+        self.assertEqual(4, len(set(y.colornum for y in graph)))
+
+        # A start coloring does not change the colors of the vertices
+        start = Coloring([0, 0, 0, 1])
+        colors = [y.colornum for y in graph]
+        for refine in (color_refinement, fast_color_refinement):
+            self.assertEqual(partition([0, 1, 2, 3]), partition(refine([graph], 'numpy', start).colors))
+            self.assertEqual(colors, [y.colornum for y in graph])
+
+        # Vertex 3 has no neighbours
+        colors = refine_numpy_colors(numpy.array([0, 1, 3, 4, 4]), numpy.array([1, 0, 2, 1]), numpy.array([5, 5, 5, 5]))
+        self.assertEqual(partition([0, 1, 0, 2]), partition(colors.tolist()))
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, color_refinement, [], backend='fortran')
+
+
+if __name__ == '__main__':
+    unittest.main()